@@ -0,0 +1,101 @@
+"""
+Pool of background clips pre-normalized to the TikTok format.
+
+Every TikTok render scales and crops its background to 1080x1920 at 30 fps,
+and a batch reuses the same few gameplay clips over and over. Ingesting a
+clip transcodes it once into that format with a short, fixed GOP (one
+keyframe per second), so later renders can stream-copy the span they need
+or at least skip the scale/crop on the full-resolution source.
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from disk_cache import DiskCache
+from utils import VIDEO_EXTENSIONS, run_ffmpeg
+
+POOL_DIR = os.path.join("cache", "backgrounds")
+POOL_MAX_BYTES = 50 * 1024 ** 3
+
+POOL_WIDTH, POOL_HEIGHT, POOL_FPS = 1080, 1920, 30
+# One keyframe per second, never placed by scene detection, so cuts land within a second of any target
+POOL_GOP = POOL_FPS
+
+# Video filter producing the vertical TikTok layout
+TIKTOK_VIDEO_FILTER = (f"scale={POOL_WIDTH}:{POOL_HEIGHT}:force_original_aspect_ratio=increase,"
+                       f"crop={POOL_WIDTH}:{POOL_HEIGHT},setsar=1,fps={POOL_FPS}")
+
+pool_cache = DiskCache(POOL_DIR, max_bytes=POOL_MAX_BYTES)
+
+
+def _pool_key(source_path):
+    # A pooled clip is only valid for the exact source version it was made from
+    stat = os.stat(source_path)
+    return DiskCache.make_key("background", os.path.abspath(source_path), stat.st_mtime_ns, stat.st_size,
+                              POOL_WIDTH, POOL_HEIGHT, POOL_FPS, POOL_GOP)
+
+
+def is_normalized(info) -> bool:
+    """Whether probe_media info describes a clip already in the pool format."""
+    return (info.get("video_codec") == "h264"
+            and info.get("width") == POOL_WIDTH and info.get("height") == POOL_HEIGHT
+            and info.get("fps") is not None and abs(info["fps"] - POOL_FPS) < 0.01)
+
+
+def lookup(source_path: str) -> Optional[str]:
+    """Return the pooled version of a background clip, or None if it hasn't been ingested."""
+    try:
+        return pool_cache.get(_pool_key(source_path), ".mp4")
+    except FileNotFoundError:
+        return None
+
+
+def normalize_background(source_path: str, preset: str = "medium", crf: int = 18) -> str:
+    """Transcode a clip into the pool (once) and return the pooled path."""
+    key = _pool_key(source_path)
+    pooled = pool_cache.get(key, ".mp4")
+    if pooled:
+        return pooled
+
+    fd, tmp_path = tempfile.mkstemp(dir=pool_cache.cache_dir, suffix=".mp4.tmp")
+    os.close(fd)
+    cmd = [
+        "ffmpeg", "-y",
+        "-i", source_path,
+        "-vf", TIKTOK_VIDEO_FILTER,
+        "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+        "-g", str(POOL_GOP), "-keyint_min", str(POOL_GOP), "-sc_threshold", "0",
+        "-an", "-movflags", "+faststart",
+        "-f", "mp4", tmp_path
+    ]
+    try:
+        run_ffmpeg(cmd)
+        return pool_cache.put(key, tmp_path, ".mp4", move=True)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def ingest_directory(video_dir: str, workers: int = 2) -> List[Tuple[str, str]]:
+    """Normalize every background clip in a directory into the pool.
+
+    Returns:
+        (source, pooled) path pairs
+    """
+    sources = sorted({path for pattern in VIDEO_EXTENSIONS for path in glob.glob(os.path.join(video_dir, pattern))})
+    # Each ffmpeg already uses several cores, so only a couple run at once
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(zip(sources, pool.map(normalize_background, sources)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-normalize background clips for TikTok renders.")
+    parser.add_argument("video_dir", help="Directory containing background videos")
+    parser.add_argument("--workers", type=int, default=2, help="Number of clips transcoded at once")
+    args = parser.parse_args()
+    pairs = ingest_directory(args.video_dir, workers=args.workers)
+    print(f"✅ {len(pairs)} background clips in the pool ({POOL_DIR})")
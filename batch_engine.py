@@ -0,0 +1,599 @@
+"""
+Headless batch engine for TikTok Video Maker.
+
+Runs the text -> narration -> video -> subtitles pipeline without any Tk
+dependency, so the same code drives the GUI, the command line and render
+boxes without a display.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict, field
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import background_pool
+from pipeline_scheduler import Stage, run_pipeline
+from media_library import get_library
+from utils import VIDEO_EXTENSIONS, AUDIO_EXTENSIONS, load_script, synthesize_narration, speed_up_audio, decode_audio_pcm, PCM_SAMPLE_RATE, prepopulate_tts_cache, tts_cache
+from video_processor import (prepare_video, transcribe_and_chunk, align_and_chunk, burn_subtitles,
+                             render_single_pass, warm_up_whisper)
+from encoder_profiles import DEFAULT_PROFILE, PREVIEW_PROFILE, PROFILES
+from text_censor import DEFAULT_RULE_SET, available_rule_sets
+from transcription_backends import BACKENDS as TRANSCRIBERS, DEFAULT_TRANSCRIBER
+from transcription_service import TranscriptionService
+from metrics import StageMetrics, format_summary, get_recorder, new_metrics_path, write_summary
+from tts_backends import DEFAULT_TTS_BACKEND, backend_names
+from workspace import WORKSPACE_BUDGET_BYTES, JobWorkspace, workspace_root
+
+# Subtitle timing: "align" times the known script against the narration,
+# "whisper" transcribes it, "auto" aligns whenever the script is known
+SUBTITLE_MODES = ("auto", "align", "whisper")
+
+# Narration longer than this (after speed-up) switches to YouTube format
+YOUTUBE_MIN_DURATION = 180
+
+# Preview renders cover the first seconds of the video at reduced size
+PREVIEW_SECONDS = 10
+PREVIEW_SCALE = 0.5
+
+
+@dataclass
+class Job:
+    """A single render request: one script (or narration) over one background."""
+    video_file: str
+    script_file: Optional[str] = None
+    narration_file: Optional[str] = None
+    music_file: Optional[str] = None
+    youtube_mode: bool = False
+    narration_speed: float = 1.5
+    music_speed: float = 1.0
+    chunk_size: int = 3
+    font: str = "Impact"
+    font_size: int = 72
+    color: str = "#00FFFF"
+    whisper_model: str = "base"
+    transcriber: str = DEFAULT_TRANSCRIBER
+    # Backend settings, e.g. {"cpu_threads": 4, "beam_size": 1} for faster-whisper
+    transcriber_options: dict = field(default_factory=dict)
+    single_pass: bool = True
+    subtitle_mode: str = "auto"
+    censor_rules: str = DEFAULT_RULE_SET
+    tts_backend: str = DEFAULT_TTS_BACKEND
+    profile: str = DEFAULT_PROFILE
+    # Render only this many seconds, small and fast, to check subtitle styling
+    preview_seconds: Optional[float] = None
+    video_duration: Optional[float] = None
+    use_background_pool: bool = True
+    idx: Optional[int] = None
+    intermediate_dir: str = "intermediate"
+    use_tmpfs: bool = False
+    workspace_budget: Optional[int] = WORKSPACE_BUDGET_BYTES
+    output_dir: str = "video"
+    # JSONL file receiving per-stage timing and resource metrics (None = not measured)
+    metrics_file: Optional[str] = None
+
+    @property
+    def name(self):
+        return os.path.basename(self.script_file or self.narration_file or self.video_file)
+
+
+@dataclass
+class JobResult:
+    """Outcome of a rendered job, safe to send back from a worker process."""
+    idx: Optional[int]
+    name: str
+    ok: bool
+    output_path: Optional[str] = None
+    youtube_format: bool = False
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    cancelled: bool = False
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _aligns(job, script_text):
+    # A narration MP3 may not match the script, so "auto" only aligns TTS output
+    if job.subtitle_mode == "whisper" or not script_text:
+        return False
+    return job.subtitle_mode == "align" or not job.narration_file
+
+
+class JobCancelled(Exception):
+    """Raised at a stage boundary when the batch has been cancelled."""
+
+
+class JobState:
+    """Working state of a job as it moves through the pipeline stages."""
+
+    def __init__(self, job: Job, log: Optional[Callable[[str], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 on_stage: Optional[Callable[[Job, str], None]] = None):
+        self.job = job
+        self.log = log or (lambda message: None)
+        self.cancel_event = cancel_event
+        self.on_stage = on_stage
+        self.metrics = get_recorder(job.metrics_file) if job.metrics_file else None
+        # Shared batched transcriber (set by run_jobs_pipelined), used when the job's settings match
+        self.transcription_service = None
+        self.started = time.perf_counter()
+        self.workspace = None
+        # Single-pass renders apply the narration speed-up in the final filtergraph
+        self.two_pass = not job.single_pass and not job.preview_seconds
+        self.steps = 5 if self.two_pass else 3
+        self.step = 0
+        self.script_text = None
+        self.audio = None
+        # Where each synthesized piece of the script is spoken in self.audio
+        self.narration_chunks = None
+        # self.audio decoded once to 16 kHz float32, for the subtitle stage
+        self.samples = None
+        self.audio_duration = None
+        self.youtube_format = False
+        self.video_file = job.video_file
+        self.video_duration = job.video_duration
+        self.ass_file = None
+        self.output_path = None
+
+    def progress(self, message):
+        self.step += 1
+        self.log(f"[{self.step}/{self.steps}] {message}")
+
+    def work_path(self, name):
+        # The workspace is created on first use, so queued jobs don't hold directories
+        if self.workspace is None:
+            prefix = f"job{'' if self.job.idx is None else self.job.idx}_"
+            self.workspace = JobWorkspace(workspace_root(self.job.use_tmpfs, self.job.intermediate_dir), prefix,
+                                          self.job.workspace_budget)
+        return self.workspace.path_for(name)
+
+    def measure(self, stage, inputs=()):
+        """Context manager measuring part of a stage; yields StageMetrics for add_output()."""
+        if self.metrics is None:
+            return contextlib.nullcontext(StageMetrics(stage))
+        return self.metrics.measure(stage, self.job.name, self.job.idx, inputs)
+
+    def run_stage(self, name, stage):
+        """Run one stage, honouring cancellation and reporting completion."""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise JobCancelled("cancelled before " + name)
+        stage(self)
+        if self.on_stage:
+            self.on_stage(self.job, name)
+
+    def result(self, error: Optional[BaseException] = None) -> JobResult:
+        elapsed = time.perf_counter() - self.started
+        cancelled = error is not None and self.cancel_event is not None and self.cancel_event.is_set()
+        if self.workspace is not None:
+            # Failed jobs keep their intermediates for debugging; cancelled ones have nothing to inspect
+            self.workspace.close(success=error is None or cancelled, reason=repr(error))
+        if cancelled:
+            # Includes ffmpeg runs killed by the cancel request
+            return JobResult(self.job.idx, self.job.name, False, error="Cancelled", elapsed=elapsed, cancelled=True)
+        if error is not None:
+            return JobResult(self.job.idx, self.job.name, False, error=f"{type(error).__name__}: {error}",
+                             elapsed=elapsed)
+        return JobResult(self.job.idx, self.job.name, True, output_path=self.output_path,
+                         youtube_format=self.youtube_format, elapsed=elapsed)
+
+
+def stage_narration(state: JobState):
+    """Produce the narration and decide the output format.
+
+    The narration is kept at its original speed: subtitle timings are scaled
+    to the narration speed and the single-pass render applies the speed-up
+    in its filtergraph, so no sped-up copy is encoded.
+    """
+    job = state.job
+    os.makedirs(job.output_dir, exist_ok=True)
+
+    state.script_text = load_script(job.script_file, job.censor_rules) if job.script_file else None
+    if job.narration_file:
+        state.progress("Obtaining the narration")
+        state.audio = job.narration_file
+    else:
+        state.progress(f"Converting text to speech ({job.tts_backend})...")
+        with state.measure("tts", [job.script_file]) as metrics:
+            state.audio, state.narration_chunks = synthesize_narration(state.script_text,
+                                                                       state.work_path("input_audio"),
+                                                                       backend=job.tts_backend)
+            metrics.add_output(state.audio)
+
+    # Decode once; alignment/Whisper use the buffer and its length is the duration (no ffprobe)
+    with state.measure("decode", [state.audio]):
+        state.samples = decode_audio_pcm(state.audio, PCM_SAMPLE_RATE)
+    state.audio_duration = len(state.samples) / PCM_SAMPLE_RATE
+
+    # Check if YouTube mode should be used
+    state.youtube_format = job.youtube_mode and state.audio_duration / job.narration_speed > YOUTUBE_MIN_DURATION
+
+    # TikTok renders use the pre-normalized copy of the background when it has been ingested
+    pooled = background_pool.lookup(job.video_file) if job.use_background_pool and not state.youtube_format else None
+    if pooled:
+        state.video_file = pooled
+        state.video_duration = None
+
+    # Background duration comes from the media library index, probed at most once per file version
+    with state.measure("probe", [state.video_file]):
+        state.video_duration = state.video_duration or get_library().get(state.video_file)["duration"]
+
+
+def stage_subtitles(state: JobState):
+    """Time the subtitles (script alignment or Whisper) and write the ASS file."""
+    job = state.job
+    aligns = _aligns(job, state.script_text)
+    state.progress(f"{'Aligning script to' if aligns else 'Transcribing'} audio...")
+    style = dict(chunk_size=job.chunk_size, font=job.font, font_size=job.font_size, color=job.color,
+                 youtube_mode=state.youtube_format, model_name=job.whisper_model, tempo=job.narration_speed,
+                 samples=state.samples, transcriber=job.transcriber, transcriber_options=job.transcriber_options)
+    service = state.transcription_service
+    if service is not None and service.matches(job.whisper_model, job.transcriber, job.transcriber_options):
+        style["service"] = service
+    ass_path = state.work_path("output.ass")
+    with state.measure("align" if aligns else "transcribe", [state.audio]) as metrics:
+        if aligns:
+            state.ass_file = align_and_chunk(state.script_text, state.audio, ass_path, **style,
+                                             narration_chunks=state.narration_chunks)
+        else:
+            state.ass_file = transcribe_and_chunk(state.audio, ass_path, **style)
+        metrics.add_output(state.ass_file)
+    # Nothing after this stage needs the samples; don't hold them while queued for rendering
+    state.samples = None
+
+
+def stage_render(state: JobState):
+    """Encode the final video."""
+    job = state.job
+    format_name = "youtube" if state.youtube_format else "tiktok"
+
+    if job.preview_seconds:
+        state.progress(f"Rendering {job.preview_seconds:g}s preview...")
+        output_name = os.path.join(job.output_dir, f"preview_{format_name}{'' if job.idx is None else job.idx}.mp4")
+        with state.measure("preview", [state.video_file, state.audio, job.music_file]) as metrics:
+            state.output_path = render_single_pass(state.video_file, state.audio, state.ass_file, output_name,
+                                                   bg_music=job.music_file, bg_speed=job.music_speed,
+                                                   youtube_mode=state.youtube_format,
+                                                   video_duration=state.video_duration,
+                                                   narration_tempo=job.narration_speed,
+                                                   audio_duration=state.audio_duration,
+                                                   profile=PREVIEW_PROFILE, max_duration=job.preview_seconds,
+                                                   scale=PREVIEW_SCALE)
+            metrics.add_output(state.output_path)
+        return
+
+    output_name = os.path.join(job.output_dir, f"final_{format_name}{'' if job.idx is None else job.idx}.mp4")
+    if not state.two_pass:
+        state.progress(f"Rendering {'YouTube' if state.youtube_format else 'TikTok'} video in a single pass...")
+        with state.measure("render", [state.video_file, state.audio, job.music_file]) as metrics:
+            state.output_path = render_single_pass(state.video_file, state.audio, state.ass_file, output_name,
+                                                   bg_music=job.music_file, bg_speed=job.music_speed,
+                                                   youtube_mode=state.youtube_format,
+                                                   video_duration=state.video_duration,
+                                                   narration_tempo=job.narration_speed,
+                                                   audio_duration=state.audio_duration, profile=job.profile)
+            metrics.add_output(state.output_path)
+        return
+
+    # The two-pass path muxes the narration as is, so it needs a sped-up copy (PCM, not another MP3)
+    state.progress("Adjusting narration speed...")
+    with state.measure("speed_up", [state.audio]) as metrics:
+        fast_audio = speed_up_audio(state.audio, state.work_path("fast_input.wav"), factor=job.narration_speed)
+        metrics.add_output(fast_audio)
+
+    if state.youtube_format:
+        state.progress("Preparing video (YouTube format - preserving original dimensions)...")
+    else:
+        state.progress("Preparing video (TikTok format)...")
+    with state.measure("prepare", [state.video_file, fast_audio]) as metrics:
+        prepared = prepare_video(state.video_file, fast_audio, state.work_path(f"{format_name}_video.mp4"),
+                                 youtube_mode=state.youtube_format, video_duration=state.video_duration,
+                                 profile=job.profile)
+        metrics.add_output(prepared)
+
+    state.progress("Adding subtitles and background music...")
+    with state.measure("burn", [prepared, job.music_file]) as metrics:
+        state.output_path = burn_subtitles(prepared, state.ass_file, bg_music=job.music_file,
+                                           bg_speed=job.music_speed, output_path=output_name,
+                                           work_dir=state.workspace.path, profile=job.profile)
+        metrics.add_output(state.output_path)
+
+
+# Stages in order: narration is network-bound (TTS), subtitles CPU-bound
+# (Whisper), rendering CPU/IO-bound (ffmpeg)
+STAGES = [("narration", stage_narration), ("subtitles", stage_subtitles), ("render", stage_render)]
+
+
+def render_job(job: Job, log: Optional[Callable[[str], None]] = None,
+               cancel_event: Optional[threading.Event] = None,
+               on_stage: Optional[Callable[[Job, str], None]] = None) -> JobResult:
+    """Run the full pipeline for one job.
+
+    Args:
+        job: Job description
+        log: Optional callback receiving progress messages
+        cancel_event: When set, the job stops at the next stage boundary
+        on_stage: Optional callback(job, stage_name) after each finished stage
+
+    Returns:
+        JobResult describing the produced video or the error
+    """
+    state = JobState(job, log, cancel_event, on_stage)
+    try:
+        for name, stage in STAGES:
+            state.run_stage(name, stage)
+    except Exception as e:
+        return state.result(e)
+    return state.result()
+
+
+def discover_jobs(script_dir, video_dir, music_dir=None, youtube_mode=False, seed=None, **job_options) -> List[Job]:
+    """Build one job per script, pairing each with a random video and music file.
+
+    Videos and music are looked up in the media library, so only new or
+    changed files are probed and unreadable files are skipped.
+
+    Args:
+        script_dir: Directory with .txt scripts
+        video_dir: Directory with background videos
+        music_dir: Optional directory with background music
+        youtube_mode: Allow YouTube format for long narrations
+        seed: Optional seed so pairings are reproducible
+        **job_options: Extra Job fields applied to every job
+
+    Returns:
+        List of jobs, numbered from 1
+    """
+    library = get_library()
+    script_files = sorted(glob.glob(os.path.join(script_dir, "*.txt")))
+    video_files = library.scan(video_dir, VIDEO_EXTENSIONS)
+    music_files = [entry["path"] for entry in library.scan(music_dir, AUDIO_EXTENSIONS)] if music_dir else []
+
+    if not script_files:
+        raise ValueError(f"No .txt scripts found in {script_dir}")
+    if not video_files:
+        raise ValueError(f"No video files found in {video_dir}")
+
+    rng = random.Random(seed)
+    jobs = []
+    for idx, script_file in enumerate(script_files, start=1):
+        video = rng.choice(video_files)
+        jobs.append(Job(
+            video_file=video["path"],
+            video_duration=video["duration"],
+            script_file=script_file,
+            music_file=rng.choice(music_files) if music_files else None,
+            youtube_mode=youtube_mode,
+            idx=idx,
+            **job_options
+        ))
+    return jobs
+
+
+def _warm_specs(jobs):
+    # One (model, backend, settings) entry per distinct transcription setup in the batch
+    specs = {(job.whisper_model, job.transcriber, tuple(sorted(job.transcriber_options.items()))) for job in jobs}
+    return sorted(specs, key=repr)
+
+
+def _init_worker(warm_models):
+    # Runs once per pool process so the Whisper weights load before the first job
+    for model_name, transcriber, options in warm_models:
+        warm_up_whisper(model_name, transcriber=transcriber, transcriber_options=dict(options))
+
+
+def run_jobs(jobs: Iterable[Job], workers: int = 1, log: Optional[Callable[[str], None]] = None,
+             warm_up: bool = False, cancel_event: Optional[threading.Event] = None) -> Iterator[JobResult]:
+    """Render jobs and yield a result for each as soon as it finishes.
+
+    With workers=1 everything runs in the calling process, in order. With more
+    workers jobs are spread over a process pool and results arrive in
+    completion order. Each process keeps its Whisper model loaded between jobs;
+    warm_up loads it before the first job instead of during it.
+    """
+    jobs = list(jobs)
+    warm_models = _warm_specs(jobs) if warm_up else []
+    if workers <= 1:
+        _init_worker(warm_models)
+        for job in jobs:
+            yield render_job(job, log=log, cancel_event=cancel_event)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(warm_models,)) as pool:
+        futures = {pool.submit(render_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            if cancel_event is not None and cancel_event.is_set():
+                # Jobs already running in a worker finish; queued ones are dropped
+                for pending in futures:
+                    pending.cancel()
+            if future.cancelled():
+                job = futures[future]
+                yield JobResult(job.idx, job.name, False, error="Cancelled", cancelled=True)
+            else:
+                yield future.result()
+
+
+def run_jobs_pipelined(jobs: Iterable[Job], tts_workers: int = 4, subtitle_workers: int = 1,
+                       render_workers: int = 2, queue_size: int = 2,
+                       log: Optional[Callable[[str], None]] = None,
+                       cancel_event: Optional[threading.Event] = None,
+                       on_stage: Optional[Callable[[Job, str], None]] = None,
+                       transcription_service: Optional[TranscriptionService] = None) -> Iterator[JobResult]:
+    """Render jobs with the stages overlapped across jobs.
+
+    Narration for later scripts is synthesized while earlier ones are being
+    transcribed or encoded. Each stage has its own concurrency limit and at
+    most queue_size jobs wait between two stages. Results are yielded in
+    completion order. log and on_stage, if given, are called from worker
+    threads. Setting cancel_event makes every job stop at its next stage
+    boundary (pair it with utils.terminate_processes to stop running encodes).
+    With a transcription_service, jobs with matching settings are transcribed
+    in shared batches; give the subtitle stage at least as many workers as
+    narrations should be batched together. The service times subtitles with
+    the script aligner rather than Whisper's word timestamps; jobs that asked
+    for Whisper timing get a warning in the log.
+    """
+    jobs = list(jobs)
+    if transcription_service is not None and log:
+        whisper_timed = [job for job in jobs if job.subtitle_mode == "whisper" and transcription_service.matches(
+            job.whisper_model, job.transcriber, job.transcriber_options)]
+        if whisper_timed:
+            log(f"⚠️ {len(whisper_timed)} job(s) asked for Whisper subtitle timing, but batched transcription "
+                f"times subtitles with the script aligner instead. Run without --batch-transcription "
+                f"to keep Whisper's word timestamps.")
+    states = []
+    for job in jobs:
+        job_log = (lambda message, name=job.name: log(f"{name}: {message}")) if log else None
+        state = JobState(job, job_log, cancel_event, on_stage)
+        state.transcription_service = transcription_service
+        states.append(state)
+
+    workers = {"narration": tts_workers, "subtitles": subtitle_workers, "render": render_workers}
+    stages = [Stage(name, lambda state, name=name, func=func: state.run_stage(name, func), workers[name])
+              for name, func in STAGES]
+    for state, error in run_pipeline(states, stages, queue_size=queue_size):
+        yield state.result(error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render TikTok/YouTube videos from a directory of scripts.")
+    parser.add_argument("--scripts", required=True, help="Directory containing .txt scripts")
+    parser.add_argument("--videos", required=True, help="Directory containing background videos")
+    parser.add_argument("--music", help="Directory containing background music (optional)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of parallel render processes")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap stages across jobs in one process instead of using a process pool")
+    parser.add_argument("--tts-workers", type=int, default=4, help="Concurrent narrations (with --pipeline)")
+    parser.add_argument("--subtitle-workers", type=int, default=1,
+                        help="Concurrent subtitle timings (with --pipeline). openai-whisper transcribes one "
+                             "narration at a time whatever this is set to; faster-whisper and script "
+                             "alignment run in parallel")
+    parser.add_argument("--render-workers", type=int, default=2, help="Concurrent ffmpeg encodes (with --pipeline)")
+    parser.add_argument("--youtube", action="store_true", help="Use YouTube format for narrations over 3 minutes")
+    parser.add_argument("--narration-speed", type=float, default=1.5)
+    parser.add_argument("--music-speed", type=float, default=1.0)
+    parser.add_argument("--chunk-size", type=int, default=3, help="Words per subtitle chunk")
+    parser.add_argument("--whisper-model", default="base", help="Whisper model size (tiny, base, small, ...)")
+    parser.add_argument("--transcriber", choices=list(TRANSCRIBERS), default=DEFAULT_TRANSCRIBER,
+                        help="Transcription backend (faster-whisper runs int8-quantized on CPU)")
+    parser.add_argument("--transcriber-threads", type=int, default=0,
+                        help="CPU threads per faster-whisper model (0 = library default)")
+    parser.add_argument("--beam-size", type=int, default=1, help="faster-whisper beam size (1 = greedy)")
+    parser.add_argument("--compute-type", default="int8", help="faster-whisper weight type (int8, float32, ...)")
+    parser.add_argument("--batch-transcription", type=int, default=0, metavar="WINDOWS",
+                        help="Transcribe narrations from several jobs together in batches of WINDOWS "
+                             "30-second windows through one shared model (with --pipeline)")
+    parser.add_argument("--warm-up", action="store_true", help="Load the Whisper model in every worker before rendering")
+    parser.add_argument("--subtitles", choices=SUBTITLE_MODES, default="auto",
+                        help="Time subtitles by aligning the script (align) or by Whisper transcription (whisper)")
+    parser.add_argument("--censor-rules", default=DEFAULT_RULE_SET,
+                        help=f"Censorship rule set: a name ({', '.join(available_rule_sets())}) or a JSON file")
+    parser.add_argument("--tts-backend", choices=backend_names(), default=DEFAULT_TTS_BACKEND,
+                        help="Speech synthesizer (gtts needs network access, espeak-ng runs offline)")
+    parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE,
+                        help="Encoder profile: " + "; ".join(f"{p.name}: {p.description}" for p in PROFILES.values()))
+    parser.add_argument("--preview", type=float, metavar="SECONDS",
+                        help="Only render a small, fast preview of the first SECONDS of each video")
+    parser.add_argument("--two-pass", action="store_true",
+                        help="Encode the background first and burn subtitles in a second encode (legacy)")
+    parser.add_argument("--output-dir", default="video")
+    parser.add_argument("--tmpfs", action="store_true",
+                        help="Keep per-job intermediates on tmpfs (/dev/shm) when available")
+    parser.add_argument("--workspace-budget", type=float, default=WORKSPACE_BUDGET_BYTES / 1024 ** 3,
+                        help="GB of failed-job workspaces to keep for debugging before the oldest are deleted")
+    parser.add_argument("--prefill-tts", action="store_true",
+                        help="Synthesize all scripts into the TTS cache (concurrently) before rendering")
+    parser.add_argument("--ingest-backgrounds", action="store_true",
+                        help="Normalize all background videos into the TikTok clip pool before rendering")
+    parser.add_argument("--no-pool", action="store_true", help="Ignore pre-normalized background clips")
+    parser.add_argument("--seed", type=int, help="Seed for random video/music pairing")
+    parser.add_argument("--report", help="Write per-job results to this JSON file")
+    parser.add_argument("--logs-dir", default="logs", help="Where per-stage metrics (metrics_*.jsonl) are written")
+    parser.add_argument("--no-metrics", action="store_true", help="Don't record per-stage timing and resource metrics")
+    args = parser.parse_args(argv)
+    transcriber_options = {}
+    if args.transcriber == "faster-whisper":
+        transcriber_options = dict(compute_type=args.compute_type, cpu_threads=args.transcriber_threads,
+                                   beam_size=args.beam_size)
+
+    metrics_file = None if args.no_metrics else new_metrics_path(args.logs_dir)
+
+    try:
+        jobs = discover_jobs(args.scripts, args.videos, args.music, youtube_mode=args.youtube, seed=args.seed,
+                             narration_speed=args.narration_speed, music_speed=args.music_speed,
+                             chunk_size=args.chunk_size, whisper_model=args.whisper_model,
+                             transcriber=args.transcriber, transcriber_options=transcriber_options,
+                             single_pass=not args.two_pass, subtitle_mode=args.subtitles, profile=args.profile,
+                             censor_rules=args.censor_rules, tts_backend=args.tts_backend,
+                             preview_seconds=args.preview,
+                             use_background_pool=not args.no_pool,
+                             use_tmpfs=args.tmpfs, workspace_budget=int(args.workspace_budget * 1024 ** 3),
+                             output_dir=args.output_dir, metrics_file=metrics_file)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    if args.ingest_backgrounds:
+        pairs = background_pool.ingest_directory(args.videos)
+        print(f"🎬 Background pool ready: {len(pairs)} clips normalized")
+
+    if args.prefill_tts:
+        synthesized = prepopulate_tts_cache(args.scripts, rule_set=args.censor_rules, backend=args.tts_backend)
+        print(f"🎤 TTS cache prefilled: {synthesized} synthesized, {len(jobs) - synthesized} already cached")
+
+    service = None
+    if args.pipeline:
+        subtitle_workers = args.subtitle_workers
+        if args.batch_transcription:
+            service = TranscriptionService(args.whisper_model, args.transcriber, transcriber_options,
+                                           batch_size=args.batch_transcription)
+            # Subtitle workers mostly wait on the service; enough of them keeps a batch filling up
+            subtitle_workers = max(subtitle_workers, args.batch_transcription)
+        print(f"🚀 Starting bulk production: {len(jobs)} files, pipelined "
+              f"({args.tts_workers} TTS / {subtitle_workers} subtitle / {args.render_workers} render workers)")
+        if args.warm_up:
+            warm_up_whisper(args.whisper_model, transcriber=args.transcriber, transcriber_options=transcriber_options)
+        runner = run_jobs_pipelined(jobs, args.tts_workers, subtitle_workers, args.render_workers, log=print,
+                                    transcription_service=service)
+    else:
+        print(f"🚀 Starting bulk production: {len(jobs)} files with {args.workers} worker(s)")
+        runner = run_jobs(jobs, workers=args.workers, warm_up=args.warm_up)
+    started = time.perf_counter()
+    results = []
+    for result in runner:
+        results.append(result)
+        if result.ok:
+            print(f"[{len(results)}/{len(jobs)}] ✅ {result.name} -> {result.output_path} ({result.elapsed:.1f}s)")
+        else:
+            print(f"[{len(results)}/{len(jobs)}] ❌ {result.name}: {result.error}")
+    if service is not None:
+        service.close()
+
+    failed = [r for r in results if not r.ok]
+    if args.pipeline or args.workers <= 1:
+        stats = tts_cache.stats()
+        print(f"🎤 TTS cache: {stats['hits']} hits, {stats['misses']} misses, {stats['bytes'] / 1024 ** 2:.1f} MB")
+    print(f"🎉 Done in {time.perf_counter() - started:.1f}s: {len(results) - len(failed)} succeeded, {len(failed)} failed")
+
+    summary = write_summary(metrics_file) if metrics_file else None
+    if summary:
+        print(f"📊 Stage metrics: {metrics_file}")
+        print(format_summary(summary))
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump([r.to_dict() for r in sorted(results, key=lambda r: r.idx or 0)], f, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Censorship throughput: single-pass matcher vs. one regex per rule.
+
+Builds a synthetic corpus (plain words with rule words sprinkled in, in
+mixed case), checks both approaches produce the same text and reports MB/s.
+
+    python benchmarks/bench_censor.py --mb 20
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_censor import TextCensor
+
+FILLER = ("the a story about friends who went to town and found an old house near river at night "
+          "then everyone ran away because something strange happened there").split()
+
+
+def make_corpus(size_bytes, rule_words, hit_rate=0.03, seed=0):
+    rng = random.Random(seed)
+    words, size = [], 0
+    while size < size_bytes:
+        if rng.random() < hit_rate:
+            word = rng.choice(rule_words)
+            word = rng.choice([word, word.capitalize(), word.upper()])
+        else:
+            word = rng.choice(FILLER)
+        if rng.random() < 0.08:
+            word += rng.choice(".,!?")
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def censor_per_rule(censor, text):
+    """The previous implementation: one compiled regex per rule, applied in turn, then again to report."""
+    patterns = {word: re.compile(r'\b' + re.escape(word) + r'\b', re.IGNORECASE) for word in censor.censorship_map}
+    censored = text
+    for word, pattern in patterns.items():
+        censored = pattern.sub(censor.censorship_map[word], censored)
+    flagged = [word for word, pattern in patterns.items() if pattern.search(text)]
+    return censored, flagged
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TextCensor throughput.")
+    parser.add_argument("--mb", type=float, default=10, help="Corpus size in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per approach (best is reported)")
+    args = parser.parse_args(argv)
+
+    censor = TextCensor()
+    corpus = make_corpus(int(args.mb * 1024 ** 2), list(censor.censorship_map))
+    megabytes = len(corpus.encode("utf-8")) / 1024 ** 2
+
+    legacy_time, (legacy_text, legacy_flagged) = timed(lambda: censor_per_rule(censor, corpus), args.repeat)
+    single_time, result = timed(lambda: censor.censor(corpus), args.repeat)
+
+    if result.text != legacy_text or [hit.word for hit in result.hits] != legacy_flagged:
+        print("❌ Single-pass output differs from the per-rule implementation")
+        return 1
+
+    hits = sum(hit.count for hit in result.hits)
+    print(f"Corpus: {megabytes:.1f} MB, {hits} hits over {len(result.hits)} rules")
+    print(f"Per-rule regexes: {legacy_time:.3f}s ({megabytes / legacy_time:.1f} MB/s)")
+    print(f"Single pass:      {single_time:.3f}s ({megabytes / single_time:.1f} MB/s)")
+    print(f"Speed-up:         {legacy_time / single_time:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""
+End-to-end pipeline benchmark on synthetic media, with regression checks.
+
+Everything is generated offline and deterministically, so runs on different
+days (or branches) measure the code rather than the inputs:
+- background videos: ffmpeg's testsrc2 pattern at several resolutions and
+  frame rates, with a sine soundtrack
+- background music: a sine tone mixed with pink noise
+- narration: a canned story spoken by a local stand-in TTS engine that
+  writes one tone burst per word, sized by syllable count (or espeak-ng with
+  --tts espeak-ng)
+
+Each stage (censoring, TTS, speed-up, alignment, transcription, prepare,
+burn, single-pass render) and the full job pipeline are run --repeat times.
+The best time is kept. TTS and transcript caches are pointed at empty
+directories for every run, so every run does the full work. Results are
+written as JSON and compared against a stored baseline; stages slower than
+the baseline by more than --tolerance are reported as regressions and the
+exit status is 1.
+
+    python benchmarks/bench_pipeline.py --update-baseline       # record benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --json results.json     # later: compare against it
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import media_library
+import utils
+import video_processor
+from batch_engine import Job, render_job
+from disk_cache import DiskCache
+from encoder_profiles import DEFAULT_PROFILE, PROFILES
+from subtitle_aligner import count_syllables
+from text_censor import TextCensor
+from transcription_backends import BACKENDS, DEFAULT_TRANSCRIBER, get_transcriber
+from tts_backends import TTSBackend, backend_names, register_backend
+from utils import run_ffmpeg, speed_up_audio, synthesize_narration
+from video_processor import align_audio, burn_subtitles, prepare_video, render_single_pass, transcribe_audio, write_ass
+from workspace import JobWorkspace
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# name: (width, height, fps)
+RESOLUTIONS = {
+    "360p30": (640, 360, 30),
+    "720p30": (1280, 720, 30),
+    "1080p30": (1920, 1080, 30),
+    "1080p60": (1920, 1080, 60),
+}
+
+STORY = ("I moved into the old house at the end of Maple Street last autumn. "
+         "The neighbours warned me about the basement, but I laughed it off. "
+         "On the third night I heard footsteps below the floor, slow and heavy. "
+         "When I opened the basement door, the stairs were wet, as if someone had just walked up from a flooded room. "
+         "Nobody had. The house has no water in the basement at all. ")
+
+NARRATION_SPEED = 1.5
+
+
+class ToneSpeechBackend(TTSBackend):
+    """Offline TTS stand-in: one tone burst per word, timed like speech."""
+
+    name = "bench-tones"
+    extension = ".wav"
+    sample_rate = 16000
+
+    def synthesize(self, text, output_path, lang="en"):
+        rate = self.sample_rate
+        pieces = []
+        for word in text.split():
+            # About four syllables a second, with longer pauses at punctuation like a narrator
+            seconds = 0.25 * count_syllables(word)
+            t = np.arange(int(seconds * rate)) / rate
+            pieces.append(0.4 * np.sin(2 * np.pi * (140 + 40 * (len(word) % 4)) * t))
+            pause = 0.4 if re.search(r"[.!?,;:]$", word) else 0.06
+            pieces.append(np.zeros(int(pause * rate)))
+        audio = np.concatenate(pieces) if pieces else np.zeros(rate)
+        with wave.open(output_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(rate)
+            f.writeframes((audio * 32767).astype(np.int16).tobytes())
+        return output_path
+
+
+def make_video(path, width, height, fps, seconds):
+    run_ffmpeg(["ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+                "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+                "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path])
+    return path
+
+
+def make_music(path, seconds):
+    run_ffmpeg(["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.1:duration={seconds}:seed=1",
+                "-filter_complex", "[0:a][1:a]amix=inputs=2:duration=first", path])
+    return path
+
+
+def make_script(words):
+    story = STORY.split()
+    return " ".join(story[i % len(story)] for i in range(words))
+
+
+@contextlib.contextmanager
+def isolated_caches(directory):
+    """Replace the TTS and transcript caches and the media library with empty ones in directory."""
+    saved = (utils.tts_cache, video_processor.transcript_cache)
+    utils.tts_cache = DiskCache(os.path.join(directory, "tts"), max_bytes=utils.TTS_CACHE_MAX_BYTES)
+    video_processor.transcript_cache = DiskCache(os.path.join(directory, "transcripts"),
+                                                 max_bytes=video_processor.TRANSCRIPT_CACHE_MAX_BYTES)
+    library = media_library.MediaLibrary(os.path.join(directory, "library.sqlite"))
+    previous_library = media_library.set_library(library)
+    try:
+        yield
+    finally:
+        media_library.set_library(previous_library)
+        library.close()
+        utils.tts_cache, video_processor.transcript_cache = saved
+
+
+class Runner:
+    """Times stages and collects their results."""
+
+    def __init__(self, repeat, only=None):
+        self.repeat = repeat
+        self.only = only
+        self.stages = {}
+
+    def time(self, name, func, setup=None):
+        """Run func repeat times (after setup(run), untimed) and record the best and median time."""
+        if self.only and not any(name.startswith(prefix) for prefix in self.only):
+            return
+        runs = []
+        try:
+            for run in range(self.repeat):
+                if setup:
+                    setup(run)
+                started = time.perf_counter()
+                func()
+                runs.append(time.perf_counter() - started)
+        except ImportError as e:
+            print(f"⚠️ {name}: skipped ({e})")
+            self.stages[name] = {"skipped": str(e)}
+            return
+        self.stages[name] = {"best": min(runs), "median": statistics.median(runs), "runs": runs}
+        print(f"{name:<28}{min(runs):>9.3f}s (median {statistics.median(runs):.3f}s)")
+
+
+def compare(results, baseline, tolerance):
+    """Return (stage, baseline_s, current_s, status) rows; status is ok/faster/REGRESSION/new."""
+    rows = []
+    for name, stage in results["stages"].items():
+        if "best" not in stage:
+            continue
+        base = baseline.get("stages", {}).get(name, {}).get("best")
+        if base is None:
+            rows.append((name, None, stage["best"], "new"))
+        elif stage["best"] > base * (1 + tolerance):
+            rows.append((name, base, stage["best"], "REGRESSION"))
+        elif stage["best"] < base * (1 - tolerance):
+            rows.append((name, base, stage["best"], "faster"))
+        else:
+            rows.append((name, base, stage["best"], "ok"))
+    return rows
+
+
+def environment():
+    try:
+        ffmpeg = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, text=True).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        ffmpeg = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "ffmpeg": ffmpeg}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the rendering pipeline on synthetic media.")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=["360p30", "1080p30"])
+    parser.add_argument("--seconds", type=float, default=20, help="Length of the generated backgrounds")
+    parser.add_argument("--words", type=int, default=60, help="Length of the narrated script")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (the best is kept)")
+    parser.add_argument("--stages", nargs="+", metavar="PREFIX", help="Only run stages whose name starts with these")
+    parser.add_argument("--tts", default=ToneSpeechBackend.name, help="TTS engine for the narration")
+    parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--transcriber", choices=list(BACKENDS), default=DEFAULT_TRANSCRIBER)
+    parser.add_argument("--model", default="tiny", help="Whisper model size for the transcription stage")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Save these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Relative slow-down tolerated before a stage counts as a regression")
+    args = parser.parse_args(argv)
+
+    register_backend(ToneSpeechBackend())
+    if args.tts not in backend_names(available_only=True):
+        print(f"❌ TTS backend {args.tts!r} is not available here")
+        return 2
+
+    config = {key: getattr(args, key) for key in ("resolutions", "seconds", "words", "tts", "profile",
+                                                  "transcriber", "model")}
+    runner = Runner(args.repeat, args.stages)
+    script = make_script(args.words)
+    censor = TextCensor()
+
+    with JobWorkspace(prefix="bench_pipeline_") as workspace:
+        path = workspace.path_for
+        cache_runs = iter(range(1 << 30))
+
+        def fresh_caches(_run=None):
+            # A new empty cache directory per run, entered for the rest of the run
+            stack.close()
+            stack.enter_context(isolated_caches(path(f"caches_{next(cache_runs)}")))
+
+        stack = contextlib.ExitStack()
+        with stack:
+            fresh_caches()
+            print("Generating inputs...")
+            music = make_music(path("music.wav"), args.seconds)
+            videos = {name: make_video(path(f"bg_{name}.mp4"), *RESOLUTIONS[name], args.seconds)
+                      for name in args.resolutions}
+            with open(path("script.txt"), "w", encoding="utf-8") as f:
+                f.write(script)
+            narration, chunks = synthesize_narration(script, path("narration"), backend=args.tts)
+            ass_path = write_ass(align_audio(script, narration, cache=None, chunks=chunks), path("subtitles.ass"),
+                                 tempo=NARRATION_SPEED)
+
+            corpus = script * max(1, (1 << 20) // len(script))
+            runner.time("censor_text", lambda: censor.censor_text(corpus))
+            runner.time("tts", lambda: synthesize_narration(script, path("tts_run"), cache=None, backend=args.tts))
+            runner.time("speed_up_audio", lambda: speed_up_audio(narration, path("fast.wav"), NARRATION_SPEED))
+            runner.time("align_and_chunk", lambda: write_ass(align_audio(script, narration, cache=None, chunks=chunks),
+                                                             path("align.ass"), tempo=NARRATION_SPEED))
+
+            def transcribe():
+                write_ass(transcribe_audio(narration, args.model, cache=None, transcriber=args.transcriber),
+                          path("transcribe.ass"), tempo=NARRATION_SPEED)
+            def load_model(run):
+                # Model loading is not part of the stage
+                if run == 0:
+                    get_transcriber(args.transcriber).warm_up(args.model)
+            runner.time("transcribe_and_chunk", transcribe, setup=load_model)
+
+            for name, video in videos.items():
+                prepared = path(f"prepared_{name}.mp4")
+                runner.time(f"prepare_video[{name}]",
+                            lambda: prepare_video(video, narration, prepared, profile=args.profile))
+                if os.path.exists(prepared):
+                    runner.time(f"burn_subtitles[{name}]",
+                                lambda: burn_subtitles(prepared, ass_path, music, output_path=path(f"burned_{name}.mp4"),
+                                                       work_dir=workspace.path, profile=args.profile))
+                runner.time(f"render_single_pass[{name}]",
+                            lambda: render_single_pass(video, narration, ass_path, path(f"single_{name}.mp4"),
+                                                       bg_music=music, narration_tempo=NARRATION_SPEED,
+                                                       profile=args.profile))
+
+                job = Job(video_file=video, script_file=path("script.txt"), music_file=music, subtitle_mode="align",
+                          tts_backend=args.tts, narration_speed=NARRATION_SPEED, profile=args.profile,
+                          use_background_pool=False, output_dir=path(f"out_{name}"),
+                          intermediate_dir=workspace.path)
+
+                def pipeline():
+                    result = render_job(job)
+                    if not result.ok:
+                        raise RuntimeError(result.error)
+                runner.time(f"pipeline[{name}]", pipeline, setup=fresh_caches)
+
+    results = {"created": datetime.datetime.now().isoformat(timespec="seconds"), "environment": environment(),
+               "config": config, "stages": runner.stages}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --update-baseline")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print("⚠️ Baseline was recorded with different settings; timings may not be comparable")
+
+    rows = compare(results, baseline, args.tolerance)
+    print(f"\n{'stage':<28}{'baseline s':>12}{'now s':>10}{'change':>9}  status")
+    for name, base, now, status in rows:
+        base_text, change = (f"{base:.3f}", f"{now / base - 1:+.0%}") if base else ("-", "")
+        print(f"{name:<28}{base_text:>12}{now:>10.3f}{change:>9}  {status}")
+    regressions = [row for row in rows if row[3] == "REGRESSION"]
+    if regressions:
+        print(f"❌ {len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Transcription backends compared on our own narration: speed and accuracy.
+
+Each script in the directory is censored and synthesized the way the
+pipeline does it (TTS cache included), then transcribed by every backend.
+Accuracy is the word error rate against the narrated script; speed is
+seconds of audio transcribed per second of wall time. Model loading is done
+up front and reported separately.
+
+Each backend is also run through the batched TranscriptionService used by
+--batch-transcription, which times subtitles with the script aligner instead
+of Whisper's word timestamps. Its timing error is how far its word start
+times are from the per-job transcription's, over the words both agree on.
+
+    python benchmarks/bench_transcription.py --scripts scripts/ --limit 10 --tts espeak-ng
+"""
+
+import argparse
+import difflib
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import percentile
+from transcription_backends import BACKENDS, get_transcriber
+from transcription_service import TranscriptionService
+from utils import PCM_SAMPLE_RATE, decode_audio_pcm, load_script, synthesize_narration
+from workspace import JobWorkspace
+
+
+def _words(text):
+    return re.sub(r"[^a-z0-9' ]", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def _word_starts(segments):
+    starts = []
+    for seg in segments:
+        for word in seg.get("words", []):
+            for text in _words(word["word"]):
+                starts.append((text, word["start"]))
+    return starts
+
+
+def word_timing_errors(reference, segments):
+    """Absolute start time differences (s) of the words two transcriptions have in common."""
+    ref, hyp = _word_starts(reference), _word_starts(segments)
+    matcher = difflib.SequenceMatcher(None, [w for w, _ in ref], [w for w, _ in hyp], autojunk=False)
+    return [abs(ref[block.a + k][1] - hyp[block.b + k][1])
+            for block in matcher.get_matching_blocks() for k in range(block.size)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark transcription backends on synthesized narration.")
+    parser.add_argument("--scripts", required=True, help="Directory containing .txt scripts")
+    parser.add_argument("--limit", type=int, default=5, help="Number of scripts to use")
+    parser.add_argument("--tts", default="gtts", help="TTS backend for the narration")
+    parser.add_argument("--model", default="base", help="Whisper model size")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--threads", type=int, default=0, help="faster-whisper CPU threads (0 = default)")
+    parser.add_argument("--beam-size", type=int, default=1, help="faster-whisper beam size")
+    parser.add_argument("--compute-type", default="int8", help="faster-whisper weight type")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Windows per batch for the batched comparison (0 = skip it)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    scripts = sorted(glob.glob(os.path.join(args.scripts, "*.txt")))[:args.limit]
+    if not scripts:
+        print(f"❌ No .txt scripts found in {args.scripts}")
+        return 2
+
+    narrations = []
+    with JobWorkspace(prefix="bench_transcription_") as workspace:
+        for index, script in enumerate(scripts):
+            text = load_script(script)
+            audio, _ = synthesize_narration(text, workspace.path_for(f"narration_{index}"), backend=args.tts)
+            narrations.append((os.path.basename(script), text, decode_audio_pcm(audio, PCM_SAMPLE_RATE)))
+    audio_seconds = sum(len(samples) for _, _, samples in narrations) / PCM_SAMPLE_RATE
+    print(f"Narration: {len(narrations)} scripts, {audio_seconds:.1f}s of audio ({args.tts})")
+
+    results = []
+    for name in args.backends:
+        options = {}
+        if name == "faster-whisper":
+            options = dict(compute_type=args.compute_type, cpu_threads=args.threads, beam_size=args.beam_size)
+        backend = get_transcriber(name, **options)
+        try:
+            started = time.perf_counter()
+            backend.warm_up(args.model)
+            load_time = time.perf_counter() - started
+        except ImportError as e:
+            print(f"⚠️ {name}: not installed ({e})")
+            continue
+
+        errors, transcripts, started = [], [], time.perf_counter()
+        for _, text, samples in narrations:
+            segments = backend.transcribe(samples, args.model)
+            transcripts.append(segments)
+            errors.append(word_error_rate(text, " ".join(seg["text"] for seg in segments)))
+        elapsed = time.perf_counter() - started
+        result = {"backend": name, "options": options, "model": args.model, "load_seconds": load_time,
+                  "transcribe_seconds": elapsed, "audio_seconds": audio_seconds,
+                  "realtime_factor": audio_seconds / elapsed, "mean_wer": sum(errors) / len(errors),
+                  "max_wer": max(errors)}
+
+        if args.batch_size:
+            # Same shared backend instance, so the model is already loaded
+            with TranscriptionService(args.model, name, options, batch_size=args.batch_size, max_wait=0.1) as service:
+                started = time.perf_counter()
+                futures = [service.submit(samples) for _, _, samples in narrations]
+                batched = [future.result() for future in futures]
+                batched_elapsed = time.perf_counter() - started
+            batched_errors = [word_error_rate(text, " ".join(seg["text"] for seg in segments))
+                              for (_, text, _), segments in zip(narrations, batched)]
+            offsets = [error for reference, segments in zip(transcripts, batched)
+                       for error in word_timing_errors(reference, segments)]
+            result["batched"] = {"batch_size": args.batch_size, "transcribe_seconds": batched_elapsed,
+                                 "realtime_factor": audio_seconds / batched_elapsed,
+                                 "mean_wer": sum(batched_errors) / len(batched_errors),
+                                 "matched_words": len(offsets),
+                                 "mean_timing_error_s": sum(offsets) / len(offsets) if offsets else None,
+                                 "p95_timing_error_s": percentile(offsets, 95) if offsets else None}
+        results.append(result)
+        backend.release()
+
+    print(f"{'backend':<16}{'load s':>9}{'total s':>10}{'x realtime':>12}{'mean WER':>10}{'max WER':>9}")
+    for r in results:
+        print(f"{r['backend']:<16}{r['load_seconds']:>9.1f}{r['transcribe_seconds']:>10.1f}"
+              f"{r['realtime_factor']:>12.1f}{r['mean_wer']:>10.1%}{r['max_wer']:>9.1%}")
+    batched = [r for r in results if "batched" in r]
+    if batched:
+        print(f"\nBatched (--batch-transcription {args.batch_size}) against per-job transcription:")
+        print(f"{'backend':<16}{'total s':>10}{'x realtime':>12}{'mean WER':>10}{'words':>8}"
+              f"{'mean timing err ms':>20}{'p95 ms':>9}")
+        for r in batched:
+            b = r["batched"]
+            mean = "-" if b["mean_timing_error_s"] is None else f"{b['mean_timing_error_s'] * 1000:.0f}"
+            p95 = "-" if b["p95_timing_error_s"] is None else f"{b['p95_timing_error_s'] * 1000:.0f}"
+            print(f"{r['backend']:<16}{b['transcribe_seconds']:>10.1f}{b['realtime_factor']:>12.1f}"
+                  f"{b['mean_wer']:>10.1%}{b['matched_words']:>8}{mean:>20}{p95:>9}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Content-addressed on-disk cache shared by the pipeline stages.
+
+Entries are files named after a SHA-256 key, so several processes can share
+one cache directory: writes go to a temporary file and are renamed into
+place, and reads touch the file so eviction can drop the least recently used
+entries once the cache grows past its size limit.
+
+Each instance keeps a running total of the cache size (one directory scan on
+first write, then the size of every write added), so a write only scans the
+directory when the total crosses the limit. Writes from other processes are
+not in the total until the next scan, so a shared cache may overshoot its
+limit until one of them evicts.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, for keying results derived from it."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Default for a function's cache argument: the module's cache as it is when
+# the function is called, so the module-level instance can be replaced
+DEFAULT_CACHE = object()
+
+
+# Eviction frees space down to this fraction of max_bytes, so a full cache
+# is scanned once per 10% of its size written rather than on every write
+EVICT_TARGET = 0.9
+
+
+class DiskCache:
+    """A size-bounded LRU cache of files keyed by content hash."""
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = None):
+        """Create (or reopen) a cache.
+
+        Args:
+            cache_dir: Directory holding the cache entries
+            max_bytes: Evict least recently used entries beyond this size (None = unbounded)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Running size total (None = not scanned yet)
+        self._size = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Hash the given parts (text, settings, ...) into a cache key."""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def path_for(self, key: str, suffix: str = "") -> str:
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def get(self, key: str, suffix: str = "") -> Optional[str]:
+        """Return the path of a cached entry, or None on a miss."""
+        path = self.path_for(key, suffix)
+        try:
+            # Touch the entry so it counts as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def get_json(self, key: str):
+        """Return a cached JSON document, or None on a miss."""
+        path = self.get(key, ".json")
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put_json(self, key: str, data) -> str:
+        """Store a JSON-serializable document and return the cached path."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".json.tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            return self.put(key, tmp_path, ".json")
+        finally:
+            os.remove(tmp_path)
+
+    def put(self, key: str, source_path: str, suffix: str = "", move: bool = False) -> str:
+        """Copy a file into the cache and return the cached path.
+
+        With move=True the file is renamed into place instead of copied, which
+        avoids copying large files; it must be on the same filesystem.
+        """
+        path = self.path_for(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        added = os.path.getsize(source_path) - self._size_of(path)
+        if move:
+            os.replace(source_path, path)
+            self._account(added)
+            return path
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._account(added)
+        return path
+
+    @staticmethod
+    def _size_of(path):
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
+    def _account(self, added: int):
+        """Add a write to the running size total and evict once it exceeds max_bytes."""
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            if self._size is None:
+                # The scan already sees the new entry
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += added
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache is under EVICT_TARGET of max_bytes.
+
+        Returns:
+            Number of entries removed
+        """
+        if self.max_bytes is None:
+            return 0
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes * EVICT_TARGET:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+        return removed
+
+    def clear(self):
+        """Remove every entry."""
+        for path, _, _ in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the cache's current size."""
+        entries = list(self._entries())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,78 @@
+"""
+Named encoder profiles for the final video.
+
+A profile bundles the video codec and its rate control (CRF or a target
+bitrate), the speed/quality preset, tune, thread count and the AAC audio
+bitrate. Every encode of a job uses the same profile, so switching from a
+quick draft to an archival master is a single setting.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """Encoder settings shared by every encode of a job."""
+    name: str
+    description: str
+    codec: str = "libx264"
+    preset: str = "slow"
+    crf: Optional[int] = 20
+    # Target video bitrate (e.g. "6M"); replaces CRF when set
+    bitrate: Optional[str] = None
+    tune: Optional[str] = None
+    # None lets the encoder pick (all cores)
+    threads: Optional[int] = None
+    audio_bitrate: str = "192k"
+    pix_fmt: str = "yuv420p"
+    extra_args: tuple = ()
+
+    def video_args(self) -> List[str]:
+        """ffmpeg output options for the video stream."""
+        args = ["-c:v", self.codec, "-preset", self.preset]
+        if self.bitrate:
+            args += ["-b:v", self.bitrate]
+        elif self.crf is not None:
+            args += ["-crf", str(self.crf)]
+        if self.tune:
+            args += ["-tune", self.tune]
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        return args + ["-pix_fmt", self.pix_fmt, *self.extra_args]
+
+    def audio_args(self) -> List[str]:
+        """ffmpeg output options for the (AAC) audio stream."""
+        return ["-c:a", "aac", "-b:a", self.audio_bitrate]
+
+
+PROFILES: Dict[str, EncoderProfile] = {profile.name: profile for profile in [
+    EncoderProfile("draft", "Fast x264 for review copies", preset="veryfast", crf=28, audio_bitrate="128k"),
+    EncoderProfile("standard", "x264, good quality for upload"),
+    EncoderProfile("archival", "x265 master copy, slow but small for its quality", codec="libx265",
+                   preset="slow", crf=18, audio_bitrate="256k",
+                   # hvc1 tag so Apple players recognise HEVC in MP4
+                   extra_args=("-tag:v", "hvc1")),
+    EncoderProfile("av1", "SVT-AV1, smallest files for storage and modern players", codec="libsvtav1",
+                   preset="8", crf=32, audio_bitrate="160k"),
+]}
+
+DEFAULT_PROFILE = "standard"
+
+# Used by preview renders only: speed over everything, the result is thrown away
+PREVIEW_PROFILE = EncoderProfile("preview", "Ultrafast low-quality preview", preset="ultrafast", crf=30,
+                                 audio_bitrate="96k")
+
+
+def get_profile(profile) -> EncoderProfile:
+    """Look up a profile by name (EncoderProfile instances are passed through).
+
+    Raises:
+        ValueError: If no profile has that name
+    """
+    if isinstance(profile, EncoderProfile):
+        return profile
+    try:
+        return PROFILES[profile or DEFAULT_PROFILE]
+    except KeyError:
+        raise ValueError(f"Unknown encoder profile {profile!r} (choose from {', '.join(PROFILES)})") from None
@@ -2,11 +2,30 @@ import tkinter as tk
 from tkinter import ttk, messagebox, font
 from tkinterdnd2 import TkinterDnD, DND_FILES
 import os
-from utils import text_to_speech, speed_up_audio
-from video_processor import prepare_video, transcribe_and_chunk, burn_subtitles
+from batch_engine import (Job, STAGES, PREVIEW_SECONDS, SUBTITLE_MODES, VIDEO_EXTENSIONS, AUDIO_EXTENSIONS,
+                          render_job, discover_jobs, run_jobs_pipelined)
+from media_library import get_library
+from metrics import format_summary, new_metrics_path, write_summary
+from encoder_profiles import DEFAULT_PROFILE, PROFILES
+from tts_backends import DEFAULT_TTS_BACKEND, backend_names
+from utils import terminate_processes
 from theme import ModernTheme, apply_modern_theme, create_modern_text_widget
-import random
 import glob
+import queue
+import subprocess
+import sys
+import threading
+
+
+def open_with_default_app(path):
+    """Open a file in the system's default application (video player for previews)."""
+    if sys.platform.startswith("win"):
+        os.startfile(path)
+    elif sys.platform == "darwin":
+        subprocess.Popen(["open", path])
+    else:
+        subprocess.Popen(["xdg-open", path])
+
 
 class App(TkinterDnD.Tk):
     def __init__(self):
@@ -43,6 +62,14 @@ class App(TkinterDnD.Tk):
         self.bulk_frame = ttk.Frame(self.notebook, style="Modern.TFrame")
         self.notebook.add(self.bulk_frame, text="  📦 Bulk Production  ")
         self.build_bulk_ui()
+
+        # Rendering runs in a worker thread; it posts log lines and progress
+        # to this queue, which the Tk main loop drains
+        self.ui_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
+        self.worker_target = (False, False)
+        self.after(100, self.drain_ui_queue)
     
 
     
@@ -73,6 +100,8 @@ class App(TkinterDnD.Tk):
         self.video_file = None
         self.bg_music_file = None
         self.youtube_mode = tk.BooleanVar(value=False)
+        self.profile = tk.StringVar(value=DEFAULT_PROFILE)
+        self.tts_backend = tk.StringVar(value=DEFAULT_TTS_BACKEND)
 
         # Create scrollable container
         canvas = tk.Canvas(self.simple_frame, bg=ModernTheme.COLORS['bg_primary'], highlightthickness=0)
@@ -110,6 +139,8 @@ class App(TkinterDnD.Tk):
         youtube_checkbox = ttk.Checkbutton(format_section, text="📺 YouTube Mode (preserves original format for videos >3min)", 
                                          variable=self.youtube_mode, style="Modern.TCheckbutton")
         youtube_checkbox.pack(anchor="w", padx=15, pady=10)
+        self.create_profile_selector(format_section, self.profile)
+        self.create_tts_selector(format_section, self.tts_backend)
 
         # Action section
         action_section = tk.Frame(scrollable_frame, bg=ModernTheme.COLORS['bg_primary'])
@@ -117,7 +148,11 @@ class App(TkinterDnD.Tk):
         
         self.start_btn = ttk.Button(action_section, text="🚀 Create Video", 
                                    command=self.start_process, style="Modern.TButton")
-        self.start_btn.pack(pady=20)
+        self.start_btn.pack(pady=(20, 10))
+        
+        self.cancel_btn = ttk.Button(action_section, text="⛔ Cancel", state="disabled",
+                                    command=self.cancel_process, style="Modern.TButton")
+        self.cancel_btn.pack(pady=(0, 20))
 
         # Progress section
         progress_section = ttk.LabelFrame(scrollable_frame, text="📊 Progress", style="Modern.TLabelframe")
@@ -211,6 +246,9 @@ class App(TkinterDnD.Tk):
         self.adv_music_file = None
         self.adv_narration_file = None
         self.adv_youtube_mode = tk.BooleanVar(value=False)
+        self.adv_profile = tk.StringVar(value=DEFAULT_PROFILE)
+        self.adv_tts_backend = tk.StringVar(value=DEFAULT_TTS_BACKEND)
+        self.preview_seconds = tk.IntVar(value=PREVIEW_SECONDS)
 
         # Create scrollable container
         canvas = tk.Canvas(self.advanced_frame, bg=ModernTheme.COLORS['bg_primary'], highlightthickness=0)
@@ -257,6 +295,7 @@ class App(TkinterDnD.Tk):
         self.subtitle_font = tk.StringVar(value="Impact")
         self.subtitle_font_size = tk.IntVar(value=72)
         self.subtitle_color = tk.StringVar(value="#00FFFF")
+        self.subtitle_timing = tk.StringVar(value="auto")
         
         self.create_subtitle_controls(subtitle_frame)
 
@@ -267,6 +306,8 @@ class App(TkinterDnD.Tk):
         adv_youtube_checkbox = ttk.Checkbutton(format_frame, text="📺 YouTube Mode (preserves original format for videos >3min)", 
                                              variable=self.adv_youtube_mode, style="Modern.TCheckbutton")
         adv_youtube_checkbox.pack(anchor="w", padx=15, pady=10)
+        self.create_profile_selector(format_frame, self.adv_profile)
+        self.create_tts_selector(format_frame, self.adv_tts_backend)
 
         # Action section
         action_frame = tk.Frame(scrollable_frame, bg=ModernTheme.COLORS['bg_primary'])
@@ -274,7 +315,26 @@ class App(TkinterDnD.Tk):
         
         self.adv_start_btn = ttk.Button(action_frame, text="🚀 Create Advanced Video", 
                                        command=self.start_process_advanced, style="Modern.TButton")
-        self.adv_start_btn.pack(pady=20)
+        self.adv_start_btn.pack(pady=(20, 10))
+        
+        preview_frame = tk.Frame(action_frame, bg=ModernTheme.COLORS['bg_primary'])
+        preview_frame.pack(pady=(0, 10))
+        
+        self.adv_preview_btn = ttk.Button(preview_frame, text="👁️ Quick Preview",
+                                         command=self.start_preview, style="Modern.TButton")
+        self.adv_preview_btn.pack(side="left", padx=(0, 10))
+        
+        preview_spinbox = tk.Spinbox(preview_frame, from_=3, to=60, textvariable=self.preview_seconds,
+                                    bg=ModernTheme.COLORS['bg_tertiary'], fg=ModernTheme.COLORS['text_primary'],
+                                    font=ModernTheme.FONTS['body'], width=5)
+        preview_spinbox.pack(side="left")
+        
+        preview_label = ttk.Label(preview_frame, text="seconds", style="Modern.TLabel")
+        preview_label.pack(side="left", padx=(5, 0))
+        
+        self.adv_cancel_btn = ttk.Button(action_frame, text="⛔ Cancel", state="disabled",
+                                        command=self.cancel_process, style="Modern.TButton")
+        self.adv_cancel_btn.pack(pady=(0, 20))
 
         # Progress section
         progress_section = ttk.LabelFrame(scrollable_frame, text="📊 Progress", style="Modern.TLabelframe")
@@ -307,6 +367,34 @@ class App(TkinterDnD.Tk):
                               font=ModernTheme.FONTS['heading'], width=6)
         value_label.pack(side="right", padx=10, pady=5)
     
+    def create_profile_selector(self, parent, variable):
+        """Create the encoder profile dropdown with a description of the selected profile"""
+        profile_frame = tk.Frame(parent, bg=ModernTheme.COLORS['bg_secondary'])
+        profile_frame.pack(anchor="w", padx=15, pady=(0, 10))
+        
+        profile_label = ttk.Label(profile_frame, text="🎞️ Encoder Profile:", style="Modern.TLabel")
+        profile_label.pack(side="left")
+        
+        profile_combo = ttk.Combobox(profile_frame, textvariable=variable, width=12, state="readonly",
+                                     values=list(PROFILES))
+        profile_combo.pack(side="left", padx=(10, 10))
+        
+        description_label = ttk.Label(profile_frame, text=PROFILES[variable.get()].description, style="Modern.TLabel")
+        description_label.pack(side="left")
+        variable.trace_add("write", lambda *args: description_label.config(text=PROFILES[variable.get()].description))
+
+    def create_tts_selector(self, parent, variable):
+        """Create the text-to-speech engine dropdown (only engines usable on this machine)"""
+        tts_frame = tk.Frame(parent, bg=ModernTheme.COLORS['bg_secondary'])
+        tts_frame.pack(anchor="w", padx=15, pady=(0, 10))
+        
+        tts_label = ttk.Label(tts_frame, text="🎤 Voice Engine:", style="Modern.TLabel")
+        tts_label.pack(side="left")
+        
+        tts_combo = ttk.Combobox(tts_frame, textvariable=variable, width=12, state="readonly",
+                                 values=backend_names(available_only=True))
+        tts_combo.pack(side="left", padx=(10, 0))
+
     def create_subtitle_controls(self, parent):
         """Create subtitle customization controls"""
         # Frequency
@@ -359,12 +447,22 @@ class App(TkinterDnD.Tk):
         
         self.subtitle_color.trace("w", update_color_preview)
 
+        # Timing source
+        timing_label = ttk.Label(parent, text="⏱️ Timing:", style="Modern.TLabel")
+        timing_label.grid(row=4, column=0, sticky="w", padx=15, pady=8)
+        
+        timing_combo = ttk.Combobox(parent, textvariable=self.subtitle_timing, width=15, state="readonly",
+                                   values=list(SUBTITLE_MODES))
+        timing_combo.grid(row=4, column=1, sticky="w", padx=(10, 15), pady=8)
+
     # ---------------- Bulk Production Mode UI ----------------
     def build_bulk_ui(self):
         self.script_dir = None
         self.video_dir = None
         self.music_dir = None
         self.bulk_youtube_mode = tk.BooleanVar(value=False)
+        self.bulk_profile = tk.StringVar(value=DEFAULT_PROFILE)
+        self.bulk_tts_backend = tk.StringVar(value=DEFAULT_TTS_BACKEND)
 
         # Create scrollable container
         canvas = tk.Canvas(self.bulk_frame, bg=ModernTheme.COLORS['bg_primary'], highlightthickness=0)
@@ -397,6 +495,8 @@ class App(TkinterDnD.Tk):
         bulk_youtube_checkbox = ttk.Checkbutton(format_frame, text="📺 YouTube Mode (preserves original format for videos >3min)", 
                                               variable=self.bulk_youtube_mode, style="Modern.TCheckbutton")
         bulk_youtube_checkbox.pack(anchor="w", padx=15, pady=10)
+        self.create_profile_selector(format_frame, self.bulk_profile)
+        self.create_tts_selector(format_frame, self.bulk_tts_backend)
 
         # Bulk settings section
         settings_frame = ttk.LabelFrame(scrollable_frame, text="⚙️ Batch Settings", style="Modern.TLabelframe")
@@ -417,7 +517,11 @@ class App(TkinterDnD.Tk):
         
         self.bulk_start_btn = ttk.Button(action_frame, text="🚀 Start Bulk Production", 
                                         command=self.start_bulk_process, style="Modern.TButton")
-        self.bulk_start_btn.pack(pady=20)
+        self.bulk_start_btn.pack(pady=(20, 10))
+        
+        self.bulk_cancel_btn = ttk.Button(action_frame, text="⛔ Cancel", state="disabled",
+                                         command=self.cancel_process, style="Modern.TButton")
+        self.bulk_cancel_btn.pack(pady=(0, 20))
 
         # Progress section
         progress_section = ttk.LabelFrame(scrollable_frame, text="📊 Progress Log", style="Modern.TLabelframe")
@@ -505,6 +609,73 @@ class App(TkinterDnD.Tk):
         box.config(state="disabled")
         self.update_idletasks()
 
+    # ---------------- Background Worker ----------------
+    def post(self, kind, *args):
+        """Queue a UI update from a worker thread (Tk may only be touched by the main thread)"""
+        self.ui_queue.put((kind, args))
+
+    def post_log(self, message):
+        advanced, bulk = self.worker_target
+        self.post("log", message, advanced, bulk)
+
+    def drain_ui_queue(self):
+        """Apply queued UI updates; reschedules itself on the Tk event loop"""
+        try:
+            while True:
+                kind, args = self.ui_queue.get_nowait()
+                if kind == "log":
+                    message, advanced, bulk = args
+                    self.log(message, advanced=advanced, bulk=bulk)
+                elif kind == "progress":
+                    value, text = args
+                    # None updates only the label and keeps the bar where it is
+                    if value is not None:
+                        self.progress_var.set(value)
+                    self.progress_label.config(text=text)
+                elif kind == "error":
+                    messagebox.showerror("Error", args[0])
+                elif kind == "open":
+                    open_with_default_app(args[0])
+                elif kind == "done":
+                    self.set_running(False)
+        except queue.Empty:
+            pass
+        self.after(100, self.drain_ui_queue)
+
+    def run_in_background(self, task, advanced=False, bulk=False):
+        """Run task in a worker thread so the window stays responsive"""
+        if self.worker and self.worker.is_alive():
+            messagebox.showinfo("Busy", "A render is already running. Cancel it or wait for it to finish.")
+            return
+        self.cancel_event.clear()
+        self.worker_target = (advanced, bulk)
+        self.set_running(True)
+
+        def run():
+            try:
+                task()
+            except Exception as e:
+                self.post("error", str(e))
+                self.post_log("❌ An error occurred.")
+            finally:
+                self.post("done")
+
+        self.worker = threading.Thread(target=run, daemon=True)
+        self.worker.start()
+
+    def set_running(self, running):
+        for button in (self.start_btn, self.adv_start_btn, self.adv_preview_btn, self.bulk_start_btn):
+            button.config(state="disabled" if running else "normal")
+        for button in (self.cancel_btn, self.adv_cancel_btn, self.bulk_cancel_btn):
+            button.config(state="normal" if running else "disabled")
+
+    def cancel_process(self):
+        """Stop the running render: no new stages start and running ffmpeg processes are killed"""
+        self.cancel_event.set()
+        terminate_processes()
+        advanced, bulk = self.worker_target
+        self.log("⛔ Cancelling...", advanced=advanced, bulk=bulk)
+
     # ---------------- Enhanced File Handlers ----------------
     def set_text(self, event):
         self.text_file = event.data.strip("{}").strip()
@@ -553,15 +724,40 @@ class App(TkinterDnD.Tk):
 
     def set_video_dir(self, event):
         self.video_dir = event.data.strip("{}").strip()
-        video_extensions = ["*.mp4", "*.avi", "*.mov", "*.mkv", "*.wmv"]
-        file_count = sum(len(glob.glob(os.path.join(self.video_dir, ext))) for ext in video_extensions)
+        file_count = sum(len(glob.glob(os.path.join(self.video_dir, ext))) for ext in VIDEO_EXTENSIONS)
         self.update_drop_zone(self.video_dir_drop, self.video_dir, f"🎬 {file_count} video files found")
+        self.index_media_dir(self.video_dir, VIDEO_EXTENSIONS, self.video_dir_drop, "🎬", "video")
 
     def set_music_dir(self, event):
         self.music_dir = event.data.strip("{}").strip()
-        audio_extensions = ["*.mp3", "*.wav", "*.m4a", "*.aac"]
-        file_count = sum(len(glob.glob(os.path.join(self.music_dir, ext))) for ext in audio_extensions)
+        file_count = sum(len(glob.glob(os.path.join(self.music_dir, ext))) for ext in AUDIO_EXTENSIONS)
         self.update_drop_zone(self.music_dir_drop, self.music_dir, f"🎼 {file_count} music files found")
+        self.index_media_dir(self.music_dir, AUDIO_EXTENSIONS, self.music_dir_drop, "🎼", "music")
+
+    def index_media_dir(self, directory, patterns, drop_zone, icon, kind):
+        """Index a media directory in the background so bulk runs don't probe files again"""
+        result = {}
+
+        def scan():
+            try:
+                result["entries"] = get_library().scan(directory, patterns)
+            except Exception as e:
+                result["error"] = e
+
+        def check():
+            if worker.is_alive():
+                self.after(200, check)
+            elif "entries" in result:
+                entries = result["entries"]
+                minutes = sum(entry["duration"] for entry in entries) / 60
+                self.update_drop_zone(drop_zone, directory,
+                                      f"{icon} {len(entries)} {kind} files indexed ({minutes:.0f} min)")
+            else:
+                self.log(f"⚠️ Could not index {directory}: {result.get('error')}", bulk=True)
+
+        worker = threading.Thread(target=scan, daemon=True)
+        worker.start()
+        self.after(200, check)
 
     # ---------------- Processes ----------------
     def start_process(self):
@@ -569,82 +765,71 @@ class App(TkinterDnD.Tk):
             messagebox.showerror("Error", "You must select a text file and a video file!")
             return
 
-        try:
-            self.log("[1/5] Converting text to speech (gTTS)...")
-            input_audio = text_to_speech(self.text_file, "intermediate/input_audio.mp3")
-
-            self.log("[2/5] Speeding up audio...")
-            fast_audio = speed_up_audio(input_audio, "intermediate/fast_input.mp3", factor=1.5)
-
-            # Check if YouTube mode should be used
-            from utils import get_audio_duration
-            audio_duration = get_audio_duration(fast_audio)
-            use_youtube_format = self.youtube_mode.get() and audio_duration > 180  # 3 minutes
-
-            if use_youtube_format:
-                self.log("[3/5] Preparing video (YouTube format - preserving original dimensions)...")
-                tiktok_video = prepare_video(self.video_file, fast_audio, "intermediate/youtube_video.mp4", youtube_mode=True)
-            else:
-                self.log("[3/5] Preparing video (TikTok format)...")
-                tiktok_video = prepare_video(self.video_file, fast_audio, "intermediate/tiktok_video.mp4")
-
-            self.log("[4/5] Transcribing audio...")
-            ass_file = transcribe_and_chunk(fast_audio, "intermediate/output.ass", chunk_size=3, youtube_mode=use_youtube_format)
-
-            self.log("[5/5] Adding subtitles and background music...")
-            output_name = "video/final_youtube.mp4" if use_youtube_format else "video/final_tiktok.mp4"
-            final = burn_subtitles(tiktok_video, ass_file, bg_music=self.bg_music_file, output_path=output_name)
-
-            format_type = "YouTube" if use_youtube_format else "TikTok"
-            self.log(f"✅ Process complete! {format_type} format video: {os.path.abspath(final)}")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.log("❌ An error occurred.")
+        job = Job(
+            video_file=self.video_file,
+            script_file=self.text_file,
+            music_file=self.bg_music_file,
+            youtube_mode=self.youtube_mode.get(),
+            profile=self.profile.get(),
+            tts_backend=self.tts_backend.get()
+        )
+        self.run_in_background(lambda: self.render_single_job(job))
 
-    def start_process_advanced(self):
+    def advanced_job(self, preview_seconds=None):
+        """Build a job from the Advanced Mode settings, or None if inputs are missing"""
         if (not self.adv_text_file and not self.adv_narration_file) or not self.adv_video_file:
             messagebox.showerror("Error", "You must select text/mp3 narration and a video file!")
-            return
-
-        try:
-            self.log("[1/5] Obtaining the narration", advanced=True)
-            input_audio = self.adv_narration_file or text_to_speech(self.adv_text_file, "intermediate/input_audio.mp3")
-
-            self.log("[2/5] Adjusting narration speed...", advanced=True)
-            fast_audio = speed_up_audio(input_audio, "intermediate/fast_input.mp3", factor=self.narration_speed.get())
+            return None
+
+        return Job(
+            video_file=self.adv_video_file,
+            script_file=self.adv_text_file,
+            narration_file=self.adv_narration_file,
+            music_file=self.adv_music_file,
+            youtube_mode=self.adv_youtube_mode.get(),
+            narration_speed=self.narration_speed.get(),
+            music_speed=self.music_speed.get(),
+            chunk_size=self.subtitle_frequency.get(),
+            font=self.subtitle_font.get(),
+            font_size=self.subtitle_font_size.get(),
+            color=self.subtitle_color.get(),
+            subtitle_mode=self.subtitle_timing.get(),
+            profile=self.adv_profile.get(),
+            tts_backend=self.adv_tts_backend.get(),
+            preview_seconds=preview_seconds
+        )
 
-            # Check if YouTube mode should be used
-            from utils import get_audio_duration
-            audio_duration = get_audio_duration(fast_audio)
-            use_youtube_format = self.adv_youtube_mode.get() and audio_duration > 180  # 3 minutes
+    def start_process_advanced(self):
+        job = self.advanced_job()
+        if job:
+            self.run_in_background(lambda: self.render_single_job(job), advanced=True)
 
-            if use_youtube_format:
-                self.log("[3/5] Preparing video (YouTube format - preserving original dimensions)...", advanced=True)
-                tiktok_video = prepare_video(self.adv_video_file, fast_audio, "intermediate/youtube_video.mp4", youtube_mode=True)
-            else:
-                self.log("[3/5] Preparing video (TikTok format)...", advanced=True)
-                tiktok_video = prepare_video(self.adv_video_file, fast_audio, "intermediate/tiktok_video.mp4")
-
-            self.log("[4/5] Transcribing audio...", advanced=True)
-            ass_file = transcribe_and_chunk(
-                fast_audio,
-                "intermediate/output.ass",
-                chunk_size=self.subtitle_frequency.get(),
-                font=self.subtitle_font.get(),
-                font_size=self.subtitle_font_size.get(),
-                color=self.subtitle_color.get(),
-                youtube_mode=use_youtube_format
-            )
-
-            self.log("[5/5] Adding subtitles and background music...", advanced=True)
-            output_name = "video/final_youtube.mp4" if use_youtube_format else "video/final_tiktok.mp4"
-            final = burn_subtitles(tiktok_video, ass_file, bg_music=self.adv_music_file, bg_speed=self.music_speed.get(), output_path=output_name)
-
-            format_type = "YouTube" if use_youtube_format else "TikTok"
-            self.log(f"✅ Process complete! {format_type} format video: {os.path.abspath(final)}", advanced=True)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.log("❌ An error occurred.", advanced=True)
+    def start_preview(self):
+        try:
+            preview_seconds = self.preview_seconds.get()
+        except tk.TclError:
+            # Empty or non-numeric spinbox
+            messagebox.showerror("Error", "Preview length must be a whole number of seconds!")
+            return
+        # Narration and subtitle timing come from the caches after the first run, so only the short encode remains
+        job = self.advanced_job(preview_seconds=preview_seconds)
+        if job:
+            self.run_in_background(lambda: self.render_single_job(job), advanced=True)
+
+    def render_single_job(self, job):
+        """Worker thread: render one job, streaming its log to the active tab"""
+        result = render_job(job, log=self.post_log, cancel_event=self.cancel_event)
+        if result.ok and job.preview_seconds:
+            self.post_log(f"👁️ Preview ready: {os.path.abspath(result.output_path)}")
+            self.post("open", result.output_path)
+        elif result.ok:
+            format_type = "YouTube" if result.youtube_format else "TikTok"
+            self.post_log(f"✅ Process complete! {format_type} format video: {os.path.abspath(result.output_path)}")
+        elif result.cancelled:
+            self.post_log("⛔ Cancelled.")
+        else:
+            self.post("error", result.error)
+            self.post_log("❌ An error occurred.")
 
     # ---------------- Bulk Process ----------------
     def start_bulk_process(self):
@@ -652,63 +837,60 @@ class App(TkinterDnD.Tk):
             messagebox.showerror("Error", "You must select directories for scripts and videos!")
             return
 
-        try:
-            script_files = glob.glob(os.path.join(self.script_dir, "*.txt"))
-            video_files = glob.glob(os.path.join(self.video_dir, "*"))
-            music_files = glob.glob(os.path.join(self.music_dir, "*")) if self.music_dir else []
+        script_dir, video_dir, music_dir = self.script_dir, self.video_dir, self.music_dir
+        youtube_mode = self.bulk_youtube_mode.get()
+        job_options = dict(profile=self.bulk_profile.get(), tts_backend=self.bulk_tts_backend.get())
+        self.progress_var.set(0)
+        self.run_in_background(lambda: self.render_bulk(script_dir, video_dir, music_dir, youtube_mode, **job_options),
+                               bulk=True)
 
-            if not script_files or not video_files:
-                messagebox.showerror("Error", "No valid files found in the selected directories!")
-                return
-
-            total_files = len(script_files)
-            self.log(f"🚀 Starting bulk production: {total_files} files to process", bulk=True)
-            
-            for idx, script_file in enumerate(script_files, start=1):
-                # Update progress
-                progress = (idx - 1) / total_files * 100
-                self.progress_var.set(progress)
-                self.progress_label.config(text=f"Processing {idx}/{total_files}: {os.path.basename(script_file)}")
-                
-                self.log(f"[{idx}/{total_files}] Processing {os.path.basename(script_file)}...", bulk=True)
-
-                # Select random video and music
-                video_file = random.choice(video_files)
-                music_file = random.choice(music_files) if music_files else None
-
-                # Process video (simplified logging)
-                input_audio = text_to_speech(script_file, f"intermediate/input_audio_{idx}.mp3")
-                fast_audio = speed_up_audio(input_audio, f"intermediate/fast_input_{idx}.mp3", factor=1.5)
-                
-                # Check if YouTube mode should be used
-                from utils import get_audio_duration
-                audio_duration = get_audio_duration(fast_audio)
-                use_youtube_format = self.bulk_youtube_mode.get() and audio_duration > 180  # 3 minutes
-                
-                if use_youtube_format:
-                    tiktok_video = prepare_video(video_file, fast_audio, f"intermediate/youtube_video_{idx}.mp4", youtube_mode=True)
-                    output_name = f"video/final_youtube{idx}.mp4"
-                else:
-                    tiktok_video = prepare_video(video_file, fast_audio, f"intermediate/tiktok_video_{idx}.mp4")
-                    output_name = f"video/final_tiktok{idx}.mp4"
-                
-                ass_file = transcribe_and_chunk(fast_audio, f"intermediate/output_{idx}.ass", chunk_size=3, youtube_mode=use_youtube_format)
-                final = burn_subtitles(
-                    tiktok_video,
-                    ass_file,
-                    bg_music=music_file,
-                    output_path=output_name
-                )
+    def render_bulk(self, script_dir, video_dir, music_dir, youtube_mode, **job_options):
+        """Worker thread: render a whole batch, reporting progress per finished stage"""
+        metrics_file = new_metrics_path()
+        try:
+            jobs = discover_jobs(script_dir, video_dir, music_dir, youtube_mode=youtube_mode,
+                                 metrics_file=metrics_file, **job_options)
+        except ValueError as e:
+            self.post("error", f"No valid files found in the selected directories!\n{e}")
+            return
 
-                self.log(f"✅ Created: {os.path.basename(final)}", bulk=True)
+        total_files = len(jobs)
+        total_steps = total_files * len(STAGES)
+        self.post_log(f"🚀 Starting bulk production: {total_files} files to process")
+
+        steps_done = [0]
+        steps_lock = threading.Lock()
+
+        def on_stage(job, stage_name):
+            with steps_lock:
+                steps_done[0] += 1
+                progress = steps_done[0] / total_steps * 100
+            self.post("progress", progress, f"{job.name}: {stage_name} done")
+
+        failed = cancelled = 0
+        for done, result in enumerate(run_jobs_pipelined(jobs, cancel_event=self.cancel_event, on_stage=on_stage),
+                                      start=1):
+            if result.ok:
+                self.post_log(f"[{done}/{total_files}] ✅ Created: {os.path.basename(result.output_path)}")
+            elif result.cancelled:
+                cancelled += 1
+            else:
+                failed += 1
+                self.post_log(f"[{done}/{total_files}] ❌ {result.name}: {result.error}")
+
+        if cancelled:
+            self.post_log(f"⛔ Bulk production cancelled: {total_files - failed - cancelled} created, {cancelled} skipped.")
+            self.post("progress", None, "⛔ Cancelled")
+        elif failed:
+            self.post_log(f"⚠️ Bulk production finished with {failed} failed job(s).")
+            self.post("progress", 100, f"❌ {failed} of {total_files} videos failed")
+        else:
+            self.post_log("🎉 Bulk production complete!")
+            self.post("progress", 100, "✅ All videos processed successfully!")
 
-            self.log("🎉 Bulk production complete!", bulk=True)
-            self.progress_var.set(100)
-            self.progress_label.config(text="✅ All videos processed successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.log("❌ An error occurred during bulk processing.", bulk=True)
-            self.progress_label.config(text="❌ Processing failed")
+        summary = write_summary(metrics_file)
+        if summary:
+            self.post_log(f"📊 Stage metrics saved to {metrics_file}\n{format_summary(summary)}")
 
 if __name__ == "__main__":
     app = App()
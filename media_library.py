@@ -0,0 +1,254 @@
+"""
+Persistent index of background videos and music.
+
+Probing a media file means starting ffprobe, which adds up quickly for
+libraries with thousands of clips. The library keeps what the pipeline needs
+to know about each file (duration, resolution, frame rate, codecs, keyframe
+interval) in a SQLite database. Entries are keyed by path and invalidated when
+the file's mtime or size changes, so rescanning a directory only probes new or
+modified files.
+"""
+
+import glob
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from utils import ProbeError, probe_many
+
+INDEX_PATH = os.path.join("cache", "media_index.sqlite")
+
+# Only the first part of a video is read to estimate its keyframe interval
+KEYFRAME_PROBE_SECONDS = 60
+
+_COLUMNS = ["path", "mtime", "size", "duration", "width", "height", "fps", "video_codec",
+            "audio_codec", "sample_rate", "keyframe_interval", "error"]
+
+
+def keyframe_times(path, seconds=None):
+    """Timestamps of the video keyframes, from packet flags (demux only, no decoding).
+
+    Args:
+        path: Video file
+        seconds: Only read this much of the file (None = whole file)
+    """
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0"]
+    if seconds:
+        cmd += ["-read_intervals", f"%+{seconds}"]
+    cmd += ["-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                times.append(float(pts_time))
+            except ValueError:
+                continue
+    return sorted(times)
+
+
+def _keyframe_interval(path):
+    times = keyframe_times(path, KEYFRAME_PROBE_SECONDS)
+    if len(times) < 2:
+        return None
+    return (times[-1] - times[0]) / (len(times) - 1)
+
+
+def _index_fields(path, info):
+    # info is a probe_media result or the ProbeError it raised
+    if isinstance(info, ProbeError):
+        return {"error": str(info)}
+    entry = {column: info.get(column) for column in _COLUMNS if column in info}
+    entry["keyframe_interval"] = _keyframe_interval(path) if info["video_codec"] else None
+    return entry
+
+
+class MediaLibrary:
+    """SQLite-backed index of probed media files.
+
+    The index file can be shared by several processes, but each process needs
+    its own MediaLibrary: a SQLite connection must not be used on both sides
+    of a fork(). get_library() takes care of that.
+    """
+
+    def __init__(self, index_path: str = INDEX_PATH):
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(index_path, timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS media (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    duration REAL,
+                    width INTEGER,
+                    height INTEGER,
+                    fps REAL,
+                    video_codec TEXT,
+                    audio_codec TEXT,
+                    sample_rate INTEGER,
+                    keyframe_interval REAL,
+                    error TEXT,
+                    keyframes TEXT
+                )""")
+            # Indexes created before keyframe lists were stored lack the column
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(media)")}
+            if "keyframes" not in columns:
+                self._db.execute("ALTER TABLE media ADD COLUMN keyframes TEXT")
+
+    def _lookup(self, path, stat):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM media WHERE path = ?", (path,)).fetchone()
+        if row is None or row["mtime"] != stat.st_mtime or row["size"] != stat.st_size:
+            return None
+        return dict(row)
+
+    def _store(self, entries):
+        with self._lock, self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO media ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [[entry.get(column) for column in _COLUMNS] for entry in entries])
+
+    def _probe_entry(self, path, stat, info):
+        entry = dict.fromkeys(_COLUMNS)
+        entry.update(_index_fields(path, info))
+        entry.update(path=path, mtime=stat.st_mtime, size=stat.st_size)
+        return entry
+
+    def get(self, path: str) -> Dict:
+        """Return the index entry for a file, probing it if it's new or changed."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self._lookup(path, stat)
+        if entry is None:
+            entry = self._probe_entry(path, stat, probe_many([path])[path])
+            try:
+                self._store([entry])
+            except sqlite3.OperationalError:
+                # Index busy (other processes writing): the entry is still right, just not saved
+                pass
+        return entry
+
+    def keyframes(self, path: str) -> List[float]:
+        """Return the file's full keyframe index, computing and storing it on first use.
+
+        If the index is busy the keyframes are still returned, just not stored.
+        """
+        entry = self.get(path)
+        if entry.get("keyframes") is not None:
+            return json.loads(entry["keyframes"])
+        times = keyframe_times(entry["path"]) if entry["video_codec"] else []
+        try:
+            with self._lock, self._db:
+                self._db.execute("UPDATE media SET keyframes = ? WHERE path = ? AND mtime = ? AND size = ?",
+                                 (json.dumps(times), entry["path"], entry["mtime"], entry["size"]))
+        except sqlite3.OperationalError:
+            pass
+        return times
+
+    def update(self, paths: Iterable[str], workers: int = 8) -> List[Dict]:
+        """Bring the index up to date for the given files, probing stale ones in parallel.
+
+        Returns:
+            Index entries in the same order as paths
+        """
+        paths = [os.path.abspath(p) for p in paths]
+        entries, stale = {}, []
+        for path in paths:
+            stat = os.stat(path)
+            entry = self._lookup(path, stat)
+            if entry is None:
+                stale.append((path, stat))
+            else:
+                entries[path] = entry
+
+        if stale:
+            infos = probe_many([path for path, _ in stale], workers=workers)
+            # Keyframe scans are separate ffprobe runs; threads are enough to overlap them
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                probed = list(pool.map(lambda item: self._probe_entry(*item, infos[item[0]]), stale))
+            self._store(probed)
+            entries.update((entry["path"], entry) for entry in probed)
+        return [entries[path] for path in paths]
+
+    def scan(self, directory: str, patterns: Iterable[str], workers: int = 8) -> List[Dict]:
+        """Index every file in a directory matching the glob patterns.
+
+        Returns:
+            Entries for files that probed successfully, sorted by path
+        """
+        files = set()
+        for pattern in patterns:
+            files.update(glob.glob(os.path.join(directory, pattern)))
+        entries = self.update(sorted(files), workers=workers)
+        return [entry for entry in entries if not entry["error"]]
+
+    def prune(self) -> int:
+        """Drop entries for files that no longer exist."""
+        with self._lock:
+            paths = [row[0] for row in self._db.execute("SELECT path FROM media")]
+        missing = [(p,) for p in paths if not os.path.exists(p)]
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM media WHERE path = ?", missing)
+        return len(missing)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_default_library = None
+_default_library_pid = None
+# Instances inherited from a parent process, kept so they are never closed here
+_inherited_libraries = []
+_default_library_lock = threading.Lock()
+
+
+def get_library() -> MediaLibrary:
+    """Process-wide library instance (one SQLite connection per process).
+
+    A process forked after its parent opened the library (e.g. a
+    ProcessPoolExecutor worker) gets its own connection to the same index.
+    """
+    global _default_library, _default_library_pid
+    with _default_library_lock:
+        if _default_library is None:
+            _default_library = MediaLibrary(INDEX_PATH)
+        elif _default_library_pid != os.getpid():
+            # The parent's connection is still in use there: don't touch it, not even to close it
+            _inherited_libraries.append(_default_library)
+            _default_library = MediaLibrary(_default_library.index_path)
+        _default_library_pid = os.getpid()
+        return _default_library
+
+
+def set_library(library: Optional[MediaLibrary]) -> Optional[MediaLibrary]:
+    """Make library the process-wide instance (None = open INDEX_PATH on next use).
+
+    The previous instance is returned and not closed, so it can be restored.
+    """
+    global _default_library, _default_library_pid
+    with _default_library_lock:
+        previous, _default_library = _default_library, library
+        _default_library_pid = os.getpid()
+        return previous
+
+
+if __name__ == "__main__":
+    # Index one or more directories: python media_library.py DIR [DIR ...]
+    library = get_library()
+    for directory in sys.argv[1:]:
+        entries = library.scan(directory, ["*"])
+        total = sum(entry["duration"] or 0 for entry in entries)
+        print(f"{directory}: {len(entries)} media files, {total / 3600:.1f} h total")
+    print(f"Pruned {library.prune()} missing files")
@@ -0,0 +1,252 @@
+"""
+Per-stage timing and resource metrics for render jobs.
+
+Each measured stage of a job (tts, decode, probe, transcribe, speed_up,
+prepare, burn, render) becomes one JSON line in a per-run file under logs/:
+
+    {"run": ..., "job": ..., "idx": ..., "stage": ..., "ok": ..., "wall_s": ...,
+     "cpu_s": ..., "process_cpu_s": ..., "peak_rss_mb": ..., "ffmpeg_runs": ...,
+     "ffmpeg_speed": ..., "ffmpeg_cpu_s": ..., "ffmpeg_peak_rss_mb": ...,
+     "input_bytes": ..., "output_bytes": ...}
+
+- cpu_s is the CPU time of the thread running the stage plus that of the
+  ffmpeg processes it started. ffmpeg reports its own CPU time and memory
+  when it runs with -benchmark, which run_ffmpeg adds while a stage is
+  being measured.
+- process_cpu_s is the whole process' CPU time over the stage. It includes
+  library threads (PyTorch, TTS chunk workers), but in pipelined runs it
+  also includes other jobs' stages running at the same time.
+- peak_rss_mb is the process' peak resident memory so far.
+- ffmpeg_speed is the final speed ffmpeg reported (seconds of media per
+  second), for the slowest ffmpeg run in the stage.
+
+Records are appended as they are produced, from any thread or worker
+process, so a crashed run still leaves its metrics behind. summarize()
+turns a file into p50/p95 per stage and the slowest jobs:
+
+    python metrics.py logs/metrics_20240101_120000.jsonl
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LOGS_DIR = "logs"
+
+_SPEED = re.compile(r"speed=\s*([\d.]+)x")
+_BENCH_TIMES = re.compile(r"bench: utime=([\d.]+)s stime=([\d.]+)s")
+_BENCH_RSS = re.compile(r"bench: maxrss=(\d+)")
+
+_current = threading.local()
+
+
+def new_metrics_path(logs_dir: str = LOGS_DIR) -> str:
+    """Path of a fresh metrics file for a run, named after the start time."""
+    os.makedirs(logs_dir, exist_ok=True)
+    return os.path.join(logs_dir, f"metrics_{datetime.datetime.now():%Y%m%d_%H%M%S}.jsonl")
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _total_size(paths) -> int:
+    return sum(os.path.getsize(p) for p in paths if p and os.path.isfile(p))
+
+
+class StageMetrics:
+    """Measurements of one stage of one job, collected while it runs."""
+
+    def __init__(self, stage: str, inputs: Iterable[str] = ()):
+        self.stage = stage
+        self.inputs = [p for p in inputs if p]
+        self.outputs = []
+        self.ffmpeg_runs = 0
+        self.ffmpeg_cpu = 0.0
+        self.ffmpeg_peak_rss_kb = None
+        self.ffmpeg_speeds = []
+
+    def add_output(self, path: Optional[str]):
+        """Count a produced file towards output_bytes."""
+        if path:
+            self.outputs.append(path)
+
+    def add_ffmpeg(self, stderr):
+        """Take speed, CPU time and memory from the stderr of an ffmpeg -benchmark run."""
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode("utf-8", "replace")
+        stderr = stderr or ""
+        self.ffmpeg_runs += 1
+        speeds = _SPEED.findall(stderr)
+        if speeds:
+            self.ffmpeg_speeds.append(float(speeds[-1]))
+        for utime, stime in _BENCH_TIMES.findall(stderr):
+            self.ffmpeg_cpu += float(utime) + float(stime)
+        for rss in _BENCH_RSS.findall(stderr):
+            self.ffmpeg_peak_rss_kb = max(self.ffmpeg_peak_rss_kb or 0, int(rss))
+
+
+def current_stage() -> Optional[StageMetrics]:
+    """The stage being measured on this thread, if any."""
+    return getattr(_current, "stage", None)
+
+
+class MetricsRecorder:
+    """Appends stage records for one run to a JSONL file."""
+
+    def __init__(self, path: str, run_id: Optional[str] = None):
+        self.path = path
+        self.run_id = run_id or os.path.splitext(os.path.basename(path))[0]
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, record: Dict):
+        line = json.dumps({"run": self.run_id, **record}) + "\n"
+        # One write per line in append mode: lines from worker processes don't interleave
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    @contextlib.contextmanager
+    def measure(self, stage: str, job: Optional[str] = None, idx: Optional[int] = None,
+                inputs: Iterable[str] = ()):
+        """Measure the enclosed block as one stage of a job and write its record.
+
+        Yields the StageMetrics so the block can add_output() the files it
+        produced. A stage that raises is recorded with ok=false.
+        """
+        metrics = StageMetrics(stage, inputs)
+        outer, _current.stage = current_stage(), metrics
+        started = datetime.datetime.now().isoformat(timespec="seconds")
+        wall, thread_cpu, process_cpu = time.perf_counter(), time.thread_time(), time.process_time()
+        ok = False
+        try:
+            yield metrics
+            ok = True
+        finally:
+            _current.stage = outer
+            thread_cpu = time.thread_time() - thread_cpu
+            speeds = metrics.ffmpeg_speeds
+            self.write({
+                "job": job, "idx": idx, "stage": stage, "ok": ok,
+                "started": started,
+                "wall_s": round(time.perf_counter() - wall, 4),
+                "cpu_s": round(thread_cpu + metrics.ffmpeg_cpu, 4),
+                "process_cpu_s": round(time.process_time() - process_cpu, 4),
+                "peak_rss_mb": _peak_rss_mb(),
+                "ffmpeg_runs": metrics.ffmpeg_runs,
+                "ffmpeg_speed": min(speeds) if speeds else None,
+                "ffmpeg_cpu_s": round(metrics.ffmpeg_cpu, 4),
+                "ffmpeg_peak_rss_mb": None if metrics.ffmpeg_peak_rss_kb is None else metrics.ffmpeg_peak_rss_kb / 1024,
+                "input_bytes": _total_size(metrics.inputs),
+                "output_bytes": _total_size(metrics.outputs),
+            })
+
+
+_recorders: Dict[str, MetricsRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder(path: str) -> MetricsRecorder:
+    """The process-wide recorder for a metrics file."""
+    with _recorders_lock:
+        recorder = _recorders.get(path)
+        if recorder is None:
+            recorder = _recorders[path] = MetricsRecorder(path)
+        return recorder
+
+
+def load_records(path: str) -> List[Dict]:
+    """Read a metrics file, skipping a truncated last line."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def percentile(values: List[float], q: float) -> float:
+    """q-th percentile (0-100) with linear interpolation between closest ranks."""
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(records: List[Dict], top: int = 5) -> Dict:
+    """Per-stage p50/p95 wall time and totals, plus the jobs that took longest.
+
+    Returns:
+        {"stages": {stage: {"count", "failed", "p50_s", "p95_s", "total_s", "cpu_s", "median_ffmpeg_speed"}},
+         "slowest_jobs": [{"job", "idx", "wall_s", "stages": {stage: wall_s}}]}
+    """
+    stages, jobs = {}, {}
+    for record in records:
+        stages.setdefault(record["stage"], []).append(record)
+        job = jobs.setdefault((record.get("idx"), record.get("job")), {})
+        job[record["stage"]] = job.get(record["stage"], 0.0) + record["wall_s"]
+
+    summary = {}
+    for stage, entries in stages.items():
+        walls = [e["wall_s"] for e in entries]
+        speeds = [e["ffmpeg_speed"] for e in entries if e.get("ffmpeg_speed")]
+        summary[stage] = {"count": len(entries), "failed": sum(not e["ok"] for e in entries),
+                          "p50_s": percentile(walls, 50), "p95_s": percentile(walls, 95), "total_s": sum(walls),
+                          "cpu_s": sum(e["cpu_s"] for e in entries),
+                          "median_ffmpeg_speed": percentile(speeds, 50) if speeds else None}
+
+    slowest = sorted(({"job": name, "idx": idx, "wall_s": sum(times.values()), "stages": times}
+                      for (idx, name), times in jobs.items()), key=lambda j: j["wall_s"], reverse=True)
+    return {"stages": summary, "slowest_jobs": slowest[:top]}
+
+
+def format_summary(summary: Dict) -> str:
+    """Render a summary as a text table."""
+    lines = [f"{'stage':<12}{'count':>7}{'failed':>8}{'p50 s':>9}{'p95 s':>9}{'total s':>10}{'cpu s':>10}{'ffmpeg x':>10}"]
+    for stage, s in sorted(summary["stages"].items(), key=lambda item: item[1]["total_s"], reverse=True):
+        speed = f"{s['median_ffmpeg_speed']:.2f}" if s["median_ffmpeg_speed"] else "-"
+        lines.append(f"{stage:<12}{s['count']:>7}{s['failed']:>8}{s['p50_s']:>9.2f}{s['p95_s']:>9.2f}"
+                     f"{s['total_s']:>10.1f}{s['cpu_s']:>10.1f}{speed:>10}")
+    if summary["slowest_jobs"]:
+        lines.append("Slowest jobs:")
+        for job in summary["slowest_jobs"]:
+            worst = max(job["stages"], key=job["stages"].get)
+            lines.append(f"  {job['wall_s']:>8.1f}s  {job['job']} (mostly {worst}: {job['stages'][worst]:.1f}s)")
+    return "\n".join(lines)
+
+
+def write_summary(metrics_path: str, top: int = 5) -> Optional[Dict]:
+    """Summarize a metrics file into <name>_summary.json next to it and return the summary."""
+    if not os.path.exists(metrics_path):
+        return None
+    summary = summarize(load_records(metrics_path), top)
+    with open(os.path.splitext(metrics_path)[0] + "_summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a per-stage metrics file.")
+    parser.add_argument("metrics_file", help="JSONL file written by a bulk run (logs/metrics_*.jsonl)")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest jobs to list")
+    args = parser.parse_args()
+    print(format_summary(summarize(load_records(args.metrics_file), args.top)))
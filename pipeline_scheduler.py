@@ -0,0 +1,89 @@
+"""
+Stage-pipelined scheduler.
+
+Runs items through a fixed sequence of stages, each with its own pool of
+worker threads, connected by bounded queues. While one item is in the last
+stage the next ones are already in earlier stages, so total time approaches
+that of the slowest stage instead of the sum of all of them. The bounded
+queues apply backpressure: a fast stage can only run a few items ahead of
+the stage after it.
+
+Threads are sufficient because the heavy work in each stage happens outside
+the GIL (network I/O, ffmpeg subprocesses, PyTorch/NumPy kernels).
+"""
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """One pipeline stage: a function applied to each item by `workers` threads."""
+    name: str
+    func: Callable[[Any], None]
+    workers: int = 1
+
+
+def run_pipeline(items: Iterable[Any], stages: List[Stage], queue_size: int = 2) -> Iterator[Tuple[Any, Optional[BaseException]]]:
+    """Push items through the stages and yield (item, error) as each one leaves the pipeline.
+
+    An item whose stage raises skips the remaining stages and is yielded with
+    the exception. Results arrive in completion order.
+
+    Args:
+        items: Work items; each stage function receives and mutates the item
+        stages: Stages in order
+        queue_size: Maximum number of items waiting between two stages
+    """
+    items = list(items)
+    if not items:
+        return
+    if any(stage.workers < 1 for stage in stages):
+        raise ValueError("every stage needs at least one worker")
+
+    # inputs[i] feeds stage i; the last queue collects finished items
+    inputs = [queue.Queue()] + [queue.Queue(maxsize=queue_size) for _ in stages[1:]] + [queue.Queue()]
+    for item in items:
+        inputs[0].put((item, None))
+
+    def worker(index, stage, remaining):
+        source, sink = inputs[index], inputs[index + 1]
+        while True:
+            entry = source.get()
+            if entry is _DONE:
+                break
+            item, error = entry
+            if error is None:
+                try:
+                    stage.func(item)
+                except Exception as e:
+                    error = e
+            # Failed items skip straight to the results; blocking here is the backpressure
+            (sink if error is None else inputs[-1]).put((item, error))
+        with remaining[1]:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and index + 1 < len(stages):
+            # Last worker of this stage tells every worker of the next stage to stop
+            for _ in range(stages[index + 1].workers):
+                sink.put(_DONE)
+
+    threads = []
+    for index, stage in enumerate(stages):
+        remaining = [stage.workers, threading.Lock()]
+        for n in range(stage.workers):
+            thread = threading.Thread(target=worker, args=(index, stage, remaining),
+                                      name=f"{stage.name}-{n + 1}", daemon=True)
+            thread.start()
+            threads.append(thread)
+    for _ in range(stages[0].workers):
+        inputs[0].put(_DONE)
+
+    for _ in items:
+        yield inputs[-1].get()
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,223 @@
+"""
+Script-to-audio alignment for subtitle timing.
+
+The narration is synthesized from a script we already have, so instead of
+running speech recognition to get the words back we only need to know *when*
+each word is spoken. Timing comes from the narration's energy envelope:
+pauses between phrases are detected as silence, phrase boundaries in the
+script (punctuation) are snapped to those pauses, and words inside a phrase
+share its speech time in proportion to their syllable count.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+ALIGN_SAMPLE_RATE = 16000
+
+FRAME_SECONDS = 0.02
+HOP_SECONDS = 0.01
+MIN_PAUSE_SECONDS = 0.12
+MIN_SPEECH_SECONDS = 0.05
+
+# Plausible speaking rates (syllables per second of voiced audio); outside
+# this range the script probably doesn't match the audio
+MIN_SYLLABLE_RATE = 1.0
+MAX_SYLLABLE_RATE = 15.0
+
+_PHRASE_END = re.compile(r"[.!?;:,…]+[\"')\]]*$")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+
+
+class AlignmentError(ValueError):
+    """Raised when the script cannot be aligned to the audio."""
+
+
+def count_syllables(word: str) -> int:
+    """Rough syllable count used as a duration weight for a word."""
+    letters = re.sub(r"[^a-z0-9]", "", word.lower())
+    if not letters:
+        return 0
+    if letters.isdigit():
+        # Numbers are read out; roughly 1.5 syllables per digit
+        return max(1, round(len(letters) * 1.5))
+    count = len(_VOWEL_GROUPS.findall(letters))
+    if letters.endswith("e") and not letters.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def split_phrases(text: str) -> List[List[str]]:
+    """Split a script into phrases (lists of words) at punctuation."""
+    phrases, current = [], []
+    for word in text.split():
+        current.append(word)
+        if _PHRASE_END.search(word):
+            phrases.append(current)
+            current = []
+    if current:
+        phrases.append(current)
+    return phrases
+
+
+def speech_regions(samples: np.ndarray, sample_rate: int = ALIGN_SAMPLE_RATE) -> List[Tuple[float, float]]:
+    """Return (start, end) times of voiced regions, with short gaps bridged."""
+    frame = int(FRAME_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    if len(samples) < frame:
+        return []
+
+    n_frames = 1 + (len(samples) - frame) // hop
+    strides = (samples.strides[0] * hop, samples.strides[0])
+    frames = np.lib.stride_tricks.as_strided(samples, shape=(n_frames, frame), strides=strides)
+    energy_db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+
+    noise, speech = np.percentile(energy_db, 10), np.percentile(energy_db, 90)
+    if speech - noise < 6:
+        return []
+    voiced = energy_db > noise + 0.35 * (speech - noise)
+
+    regions = []
+    start = None
+    for i, is_voiced in enumerate(voiced):
+        if is_voiced and start is None:
+            start = i
+        elif not is_voiced and start is not None:
+            regions.append([start * HOP_SECONDS, i * HOP_SECONDS + FRAME_SECONDS])
+            start = None
+    if start is not None:
+        regions.append([start * HOP_SECONDS, n_frames * HOP_SECONDS + FRAME_SECONDS])
+
+    # Bridge gaps too short to be a pause, then drop clicks
+    merged = []
+    for region in regions:
+        if merged and region[0] - merged[-1][1] < MIN_PAUSE_SECONDS:
+            merged[-1][1] = region[1]
+        else:
+            merged.append(region)
+    return [(s, e) for s, e in merged if e - s >= MIN_SPEECH_SECONDS]
+
+
+class _VoicedTimeline:
+    """Maps between absolute time and accumulated voiced time."""
+
+    def __init__(self, regions):
+        self.regions = regions
+
+    def voiced_between(self, t0, t1):
+        return sum(max(0.0, min(e, t1) - max(s, t0)) for s, e in self.regions)
+
+    def advance(self, t, voiced_seconds):
+        """Absolute time reached after speaking voiced_seconds starting at t."""
+        for s, e in self.regions:
+            if e <= t:
+                continue
+            s = max(s, t)
+            if voiced_seconds <= e - s:
+                return s + voiced_seconds
+            voiced_seconds -= e - s
+        return self.regions[-1][1]
+
+
+def align_script(text: str, samples: np.ndarray, sample_rate: int = ALIGN_SAMPLE_RATE) -> List[Dict]:
+    """Align a known script to narration audio.
+
+    Args:
+        text: The exact text that was narrated
+        samples: Mono float32 narration samples
+        sample_rate: Sample rate of samples
+
+    Returns:
+        Whisper-style segments, one per phrase, each with per-word timings:
+        [{"start", "end", "text", "words": [{"word", "start", "end"}]}]
+
+    Raises:
+        AlignmentError: If the text is empty, the audio is silent or the
+            speaking rate implied by the alignment is implausible
+    """
+    phrases = split_phrases(text)
+    if not phrases:
+        raise AlignmentError("script is empty")
+
+    regions = speech_regions(samples, sample_rate)
+    if not regions:
+        raise AlignmentError("no speech detected in narration")
+
+    timeline = _VoicedTimeline(regions)
+    weights = [[max(1, count_syllables(w)) for w in phrase] for phrase in phrases]
+    total_syllables = sum(sum(w) for w in weights)
+    total_voiced = timeline.voiced_between(regions[0][0], regions[-1][1])
+    rate = total_syllables / total_voiced
+    if not MIN_SYLLABLE_RATE <= rate <= MAX_SYLLABLE_RATE:
+        raise AlignmentError(f"implausible speaking rate of {rate:.1f} syllables/s")
+
+    pauses = [(regions[i][1], regions[i + 1][0]) for i in range(len(regions) - 1)]
+    speech_end = regions[-1][1]
+    cursor = regions[0][0]
+    remaining_syllables = total_syllables
+    segments = []
+
+    for index, (phrase, phrase_weights) in enumerate(zip(phrases, weights)):
+        syllables = sum(phrase_weights)
+        if index == len(phrases) - 1:
+            phrase_end, next_cursor = speech_end, speech_end
+        else:
+            # Re-estimate the rate from what is left so early errors don't accumulate
+            seconds_per_syllable = timeline.voiced_between(cursor, speech_end) / remaining_syllables
+            predicted = timeline.advance(cursor, syllables * seconds_per_syllable)
+            # Predictions are in voiced time, so they land where speech stops: the start of a pause
+            tolerance = max(0.5, 0.35 * (predicted - cursor))
+            candidates = [p for p in pauses if p[0] > cursor and abs(p[0] - predicted) <= tolerance]
+            if candidates:
+                pause = min(candidates, key=lambda p: abs(p[0] - predicted))
+                phrase_end, next_cursor = pause
+            else:
+                phrase_end, next_cursor = predicted, predicted
+
+        # Share the phrase's voiced time between its words by syllable count
+        phrase_voiced = timeline.voiced_between(cursor, phrase_end)
+        words, t = [], cursor
+        for word, weight in zip(phrase, phrase_weights):
+            word_end = min(phrase_end, timeline.advance(t, phrase_voiced * weight / syllables))
+            words.append({"word": word, "start": t, "end": word_end})
+            t = word_end
+        words[-1]["end"] = phrase_end
+
+        segments.append({"start": cursor, "end": phrase_end, "text": " ".join(phrase), "words": words})
+        remaining_syllables -= syllables
+        cursor = next_cursor
+
+    return segments
+
+
+def align_chunks(chunks: List[Dict], samples: np.ndarray, sample_rate: int = ALIGN_SAMPLE_RATE) -> List[Dict]:
+    """Align a script that was synthesized in pieces, each piece within its own span of audio.
+
+    Chunk boundaries are known exactly, so errors in one chunk cannot drift
+    into the next.
+
+    Args:
+        chunks: [{"text", "start", "end"}] pieces of the script and where they are spoken
+        samples: Mono float32 narration samples
+        sample_rate: Sample rate of samples
+
+    Returns:
+        Segments as returned by align_script, on the timeline of samples
+
+    Raises:
+        AlignmentError: If any chunk cannot be aligned
+    """
+    segments = []
+    for chunk in chunks:
+        first = int(chunk["start"] * sample_rate)
+        last = min(len(samples), int(np.ceil(chunk["end"] * sample_rate)))
+        offset = first / sample_rate
+        for segment in align_script(chunk["text"], samples[first:last], sample_rate):
+            segment["start"] += offset
+            segment["end"] += offset
+            for word in segment["words"]:
+                word["start"] += offset
+                word["end"] += offset
+            segments.append(segment)
+    return segments
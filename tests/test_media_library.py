@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import media_library
+
+
+@pytest.fixture
+def library_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "media_index.sqlite")
+    monkeypatch.setattr(media_library, "INDEX_PATH", path)
+    monkeypatch.setattr(media_library, "_default_library", None)
+    monkeypatch.setattr(media_library, "_default_library_pid", None)
+    yield path
+    if media_library._default_library is not None:
+        media_library._default_library.close()
+
+
+def _store_from_worker(index):
+    library = media_library.get_library()
+    library._store([{"path": f"/clips/{index}.mp4", "mtime": 1.0, "size": index, "duration": 10.0}])
+    # Each worker sets the parent's instance aside once and reuses its own afterwards
+    return len(media_library._inherited_libraries), library.index_path
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_forked_workers_open_their_own_connection(library_path):
+    parent = media_library.get_library()
+    with ProcessPoolExecutor(max_workers=4, mp_context=multiprocessing.get_context("fork")) as pool:
+        results = list(pool.map(_store_from_worker, range(16)))
+
+    assert all(inherited == 1 for inherited, _ in results)
+    assert {path for _, path in results} == {library_path}
+    assert media_library.get_library() is parent
+    rows = parent._db.execute("SELECT path FROM media").fetchall()
+    assert sorted(row[0] for row in rows) == sorted(f"/clips/{i}.mp4" for i in range(16))
+
+
+def test_keyframes_fall_back_to_uncached_when_index_is_busy(tmp_path, monkeypatch):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"not really a video")
+    stat = os.stat(video)
+    library = media_library.MediaLibrary(str(tmp_path / "media_index.sqlite"))
+    library._store([{"path": str(video), "mtime": stat.st_mtime, "size": stat.st_size, "video_codec": "h264"}])
+    monkeypatch.setattr(media_library, "keyframe_times", lambda path, seconds=None: [0.0, 2.0, 4.0])
+    library._db.execute("PRAGMA busy_timeout = 0")
+
+    other = sqlite3.connect(library.index_path)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        assert library.keyframes(str(video)) == [0.0, 2.0, 4.0]
+    finally:
+        other.rollback()
+        other.close()
+    assert library.get(str(video))["keyframes"] is None
+    library.close()
@@ -1,102 +1,179 @@
+import json
+import os
 import re
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# Rule sets shipped with the app; a rule set is named by file stem or given as a path
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "censor_rules")
+DEFAULT_RULE_SET = "default"
+
+
+@dataclass
+class CensorHit:
+    """One censored rule word and where it occurred in the original text."""
+    word: str
+    replacement: str
+    positions: List[int] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.positions)
+
+
+@dataclass
+class CensorResult:
+    """Censored text plus the hits found while producing it."""
+    text: str
+    hits: List[CensorHit]
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """An immutable, versioned set of word -> replacement rules."""
+    name: str
+    version: int
+    rules: Mapping[str, str]
+    language: Optional[str] = None
+    platform: Optional[str] = None
+    description: str = ""
+
+
+def _rule_set_path(rule_set: str) -> str:
+    if os.sep in rule_set or (os.altsep and os.altsep in rule_set) or rule_set.endswith(".json"):
+        return os.path.abspath(rule_set)
+    return os.path.join(RULES_DIR, f"{rule_set}.json")
+
+
+@lru_cache(maxsize=None)
+def _load_rule_set(path: str, mtime_ns: int) -> RuleSet:
+    # Keyed by mtime so an edited file is picked up by the next lookup
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # Rules are either flat ("rules") or grouped by category ("groups"), in file order
+    rules = dict(data.get("rules", {}))
+    for group in data.get("groups", {}).values():
+        rules.update(group)
+    if not all(isinstance(k, str) and isinstance(v, str) for k, v in rules.items()):
+        raise ValueError(f"{path}: rules must map words to replacement strings")
+    return RuleSet(
+        name=data.get("name", os.path.splitext(os.path.basename(path))[0]),
+        version=int(data.get("version", 1)),
+        rules=MappingProxyType({word.lower(): replacement for word, replacement in rules.items()}),
+        language=data.get("language"),
+        platform=data.get("platform"),
+        description=data.get("description", "")
+    )
+
+
+def load_rule_set(rule_set: str = DEFAULT_RULE_SET) -> RuleSet:
+    """Load a rule set by name (a file in censor_rules/) or by path to a JSON file.
+
+    Loaded rule sets are cached until their file changes.
+
+    Raises:
+        FileNotFoundError: If the rule set doesn't exist
+        ValueError: If the file is malformed
+    """
+    path = _rule_set_path(rule_set)
+    return _load_rule_set(path, os.stat(path).st_mtime_ns)
+
+
+def available_rule_sets() -> List[str]:
+    """Names of the rule sets shipped in censor_rules/."""
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(RULES_DIR) if name.endswith(".json"))
 
 
 class TextCensor:
-    """Handles censorship of inappropriate words in text scripts for content creation."""
-    
-    def __init__(self):
-        """Initialize the censor with predefined word replacements."""
-        self.censorship_map = {
-            # Violence and harm related
-            'kill': 'unalive',
-            'killed': 'unalived',
-            'killing': 'unaliving',
-            'kills': 'unalives',
-            'murder': 'unalive',
-            'murdered': 'unalived',
-            'murdering': 'unaliving',
-            'murders': 'unalives',
-            'death': 'unalived',
-            'dead': 'unalived',
-            'die': 'unalive',
-            'died': 'unalived',
-            'dying': 'unaliving',
-            'dies': 'unalives',
-            'suicide': 'self-unaliving',
-            'suicidal': 'self-unaliving',
-            
-            # Body fluids and substances
-            'blood': 'red liquid',
-            'bloody': 'red liquid covered',
-            'bleeding': 'red liquid flowing',
-            'bleed': 'red liquid flow',
-            'bleeds': 'red liquid flows',
-            'bled': 'red liquid flowed',
-            
-            # Adult content
-            'sex': 'intercourse',
-            'sexual': 'intimate',
-            'sexy': 'attractive',
-            
-            # Weapons
-            'gun': 'pew pew device',
-            'guns': 'pew pew devices',
-            'knife': 'sharp object',
-            'knives': 'sharp objects',
-            'weapon': 'tool',
-            'weapons': 'tools',
-            'bomb': 'explosive device',
-            'bombs': 'explosive devices',
-            
-            # Drugs and substances
-            'drug': 'substance',
-            'drugs': 'substances',
-            'cocaine': 'white powder',
-            'heroin': 'substance',
-            'marijuana': 'green plant',
-            'weed': 'green plant',
-            
-            # Profanity (mild replacements)
-            'damn': 'darn',
-            'hell': 'heck',
-            'crap': 'crud',
-            
-            # Other potentially flagged words
-            'virus': 'bug',
-            'pandemic': 'global health event',
-            'war': 'conflict',
-            'terrorist': 'bad person',
-            'terrorism': 'bad activities',
-        }
+    """Handles censorship of inappropriate words in text scripts for content creation.
+
+    A censor compiles its rules once and is read-only afterwards unless built
+    with frozen=False, so a shared instance can be used from any number of
+    threads. Use get_censor() to get the shared, compiled censor for a rule set.
+    """
+    
+    def __init__(self, rules=None, frozen: bool = False):
+        """Initialize the censor.
+        
+        Args:
+            rules: RuleSet, rule set name/path, or a word -> replacement dict
+                (default: the default rule set)
+            frozen: Reject add_censorship_rule/remove_censorship_rule
+        """
+        if rules is None or isinstance(rules, str):
+            rules = load_rule_set(rules or DEFAULT_RULE_SET)
+        if isinstance(rules, RuleSet):
+            self.rule_set = rules
+            rules = rules.rules
+        else:
+            self.rule_set = None
+        self.censorship_map = {word.lower(): replacement for word, replacement in rules.items()}
+        self.frozen = frozen
         
         # Compile regex patterns for efficient matching
         self._compile_patterns()
     
+    def _check_mutable(self):
+        if self.frozen:
+            raise TypeError("this censor is shared and read-only; use with_rules() to derive a modified copy")
+    
+    def with_rules(self, added: Optional[Dict[str, str]] = None, removed=()) -> "TextCensor":
+        """Return a new censor with rules added and/or removed, leaving this one untouched."""
+        rules = dict(self.censorship_map)
+        rules.update({word.lower(): replacement for word, replacement in (added or {}).items()})
+        for word in removed:
+            rules.pop(word.lower(), None)
+        return TextCensor(rules)
+    
     def _compile_patterns(self):
-        """Compile regex patterns for word replacement."""
-        self.patterns = {}
-        for word, replacement in self.censorship_map.items():
-            # Create pattern that matches whole words (case insensitive)
-            pattern = r'\b' + re.escape(word) + r'\b'
-            self.patterns[word] = re.compile(pattern, re.IGNORECASE)
+        """Compile every rule into a single whole-word, case-insensitive alternation."""
+        self._rule_order = {word: index for index, word in enumerate(self.censorship_map)}
+        if not self.censorship_map:
+            self.pattern = None
+            return
+        # Longest first, so a multi-word rule wins over a rule for one of its words
+        words = sorted(self.censorship_map, key=len, reverse=True)
+        self.pattern = re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in words) + r')\b', re.IGNORECASE)
     
-    def censor_text(self, text: str) -> str:
-        """Apply censorship to the given text.
+    def censor(self, text: str) -> CensorResult:
+        """Censor text and collect the hits in a single scan.
         
         Args:
             text: The original text to censor
             
         Returns:
-            Censored text with replacements applied
+            CensorResult with the censored text and one CensorHit per rule
+            that matched, in rule order; positions are offsets into text
         """
-        censored_text = text
+        if self.pattern is None:
+            return CensorResult(text, [])
+        hits = {}
         
-        for word, pattern in self.patterns.items():
+        def replace(match):
+            word = match.group(0).lower()
             replacement = self.censorship_map[word]
-            censored_text = pattern.sub(replacement, censored_text)
+            hit = hits.get(word)
+            if hit is None:
+                hit = hits[word] = CensorHit(word, replacement)
+            hit.positions.append(match.start())
+            return replacement
         
-        return censored_text
+        censored_text = self.pattern.sub(replace, text)
+        return CensorResult(censored_text, sorted(hits.values(), key=lambda hit: self._rule_order[hit.word]))
+    
+    def censor_text(self, text: str) -> str:
+        """Apply censorship to the given text.
+        
+        Args:
+            text: The original text to censor
+            
+        Returns:
+            Censored text with replacements applied
+        """
+        return self.censor(text).text
     
     def add_censorship_rule(self, word: str, replacement: str):
         """Add a new censorship rule.
@@ -105,9 +182,9 @@ class TextCensor:
             word: Word to be censored
             replacement: Replacement text
         """
+        self._check_mutable()
         self.censorship_map[word.lower()] = replacement
-        pattern = r'\b' + re.escape(word.lower()) + r'\b'
-        self.patterns[word.lower()] = re.compile(pattern, re.IGNORECASE)
+        self._compile_patterns()
     
     def remove_censorship_rule(self, word: str):
         """Remove a censorship rule.
@@ -115,10 +192,11 @@ class TextCensor:
         Args:
             word: Word to remove from censorship
         """
+        self._check_mutable()
         word_lower = word.lower()
         if word_lower in self.censorship_map:
             del self.censorship_map[word_lower]
-            del self.patterns[word_lower]
+            self._compile_patterns()
     
     def get_censorship_rules(self) -> Dict[str, str]:
         """Get all current censorship rules.
@@ -137,34 +215,47 @@ class TextCensor:
         Returns:
             List of words that would be censored
         """
-        flagged_words = []
-        text_lower = text.lower()
-        
-        for word, pattern in self.patterns.items():
-            if pattern.search(text):
-                flagged_words.append(word)
-        
-        return flagged_words
+        return [hit.word for hit in self.censor(text).hits]
+
+
+@lru_cache(maxsize=None)
+def _shared_censor(path: str, mtime_ns: int) -> TextCensor:
+    return TextCensor(_load_rule_set(path, mtime_ns), frozen=True)
 
 
-def censor_text_file(input_file: str, output_file: str = None) -> str:
+def get_censor(rule_set: str = DEFAULT_RULE_SET) -> TextCensor:
+    """Return the shared, compiled censor for a rule set.
+
+    Each process compiles a rule set once; later calls return the same
+    read-only instance until the rule file changes.
+    """
+    path = _rule_set_path(rule_set)
+    return _shared_censor(path, os.stat(path).st_mtime_ns)
+
+
+def censor_text_file(input_file: str, output_file: str = None, rule_set: str = DEFAULT_RULE_SET) -> str:
     """Censor a text file and optionally save to a new file.
     
     Args:
         input_file: Path to input text file
         output_file: Optional path to output file (if None, overwrites input)
+        rule_set: Rule set name or path
         
     Returns:
         Path to the censored file
     """
-    censor = TextCensor()
+    return _censor_file(input_file, output_file, rule_set)[0]
+
+
+def _censor_file(input_file, output_file, rule_set):
+    censor = get_censor(rule_set)
     
     # Read original text
     with open(input_file, 'r', encoding='utf-8') as f:
         original_text = f.read()
     
     # Apply censorship
-    censored_text = censor.censor_text(original_text)
+    result = censor.censor(original_text)
     
     # Determine output file
     if output_file is None:
@@ -172,10 +263,55 @@ def censor_text_file(input_file: str, output_file: str = None) -> str:
     
     # Write censored text
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(censored_text)
+        f.write(result.text)
+    
+    return output_file, result.hits
+
+
+def censor_directory(script_dir: str, output_dir: Optional[str] = None, rule_set: str = DEFAULT_RULE_SET,
+                     workers: Optional[int] = None) -> List[Tuple[str, List[CensorHit]]]:
+    """Censor every .txt script in a directory in parallel.
+    
+    Matching is CPU-bound Python, so files are spread over worker processes;
+    each process compiles the rule set once, not once per file.
     
-    return output_file
+    Args:
+        script_dir: Directory with .txt scripts
+        output_dir: Where to write censored copies (None overwrites the scripts)
+        rule_set: Rule set name or path
+        workers: Number of processes (default: one per CPU)
+        
+    Returns:
+        (output_file, hits) per script, sorted by input file name
+    """
+    names = sorted(name for name in os.listdir(script_dir) if name.endswith(".txt"))
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    inputs = [os.path.join(script_dir, name) for name in names]
+    outputs = [os.path.join(output_dir, name) if output_dir else None for name in names]
+    # Resolve once so every worker loads the same file
+    path = _rule_set_path(rule_set)
+    if len(inputs) <= 1 or workers == 1:
+        return [_censor_file(i, o, path) for i, o in zip(inputs, outputs)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_censor_file, inputs, outputs, [path] * len(inputs), chunksize=8))
+
+
+# Global censor instance for easy access (shared and read-only)
+default_censor = get_censor()
 
 
-# Global censor instance for easy access
-default_censor = TextCensor()
\ No newline at end of file
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Censor every .txt script in a directory.")
+    parser.add_argument("script_dir", help="Directory containing .txt scripts")
+    parser.add_argument("--output-dir", help="Write censored copies here instead of overwriting the scripts")
+    parser.add_argument("--rules", default=DEFAULT_RULE_SET, help="Rule set name or path to a JSON rule file")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    results = censor_directory(args.script_dir, args.output_dir, rule_set=args.rules, workers=args.workers)
+    for output_file, hits in results:
+        if hits:
+            print(f"{os.path.basename(output_file)}: " + ", ".join(f"{hit.word} x{hit.count}" for hit in hits))
+    rules = load_rule_set(args.rules)
+    print(f"✅ {len(results)} scripts censored with rule set {rules.name} v{rules.version}")
@@ -0,0 +1,205 @@
+"""
+Speech-to-text backends for subtitle timing.
+
+Every backend takes 16 kHz mono float32 samples and returns the same
+segment format, so the transcript cache and the ASS writer don't care which
+one produced it:
+
+    [{"start", "end", "text", "words": [{"word", "start", "end"}]}]
+
+- whisper: the reference openai-whisper PyTorch model (fp32 on CPU)
+- faster-whisper: the same weights run by CTranslate2, int8-quantized by
+  default, with configurable CPU threads and beam size; several times faster
+  on CPU-only render nodes
+
+Loaded models stay in memory for the life of the process, and
+get_transcriber() hands the same backend instance (and so the same model) to
+every caller with the same settings. Whether threads may use one model at
+the same time depends on the backend:
+
+- faster-whisper is thread-safe; concurrent calls run in parallel
+- openai-whisper is not: word timestamps are taken from forward hooks and a
+  key/value cache attached to the shared model, so concurrent calls would
+  mix up each other's state. Its calls take a per-model lock and run one at
+  a time.
+"""
+
+import contextlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+DEFAULT_TRANSCRIBER = "whisper"
+
+
+def timed_segments(segments) -> List[Dict]:
+    """Normalize backend segments to plain JSON-friendly dicts."""
+    timed = []
+    for seg in segments:
+        entry = {"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"]}
+        if seg.get("words"):
+            entry["words"] = [{"word": w["word"], "start": float(w["start"]), "end": float(w["end"])}
+                              for w in seg["words"]]
+        timed.append(entry)
+    return timed
+
+
+class TranscriptionBackend:
+    """Base class: loads models once and transcribes sample buffers."""
+
+    name = ""
+    # Whether one loaded model may run several transcriptions at once
+    thread_safe = False
+
+    def __init__(self):
+        self._models = {}
+        self._inference_locks = {}
+        self._lock = threading.Lock()
+
+    def cache_params(self, model_name: str) -> tuple:
+        """Everything besides the audio that affects the transcript, for cache keys."""
+        return (self.name, model_name)
+
+    def _load(self, model_name, device):
+        raise NotImplementedError
+
+    def _transcribe(self, model, samples) -> List[Dict]:
+        raise NotImplementedError
+
+    def load(self, model_name: str = "base", device: Optional[str] = None):
+        """Return the cached model, loading it on first use."""
+        key = (model_name, device)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._models[key] = self._load(model_name, device)
+            return model
+
+    def _inference(self, model_name, device):
+        # Serializes calls into one model unless the backend is thread-safe
+        if self.thread_safe:
+            return contextlib.nullcontext()
+        with self._lock:
+            return self._inference_locks.setdefault((model_name, device), threading.Lock())
+
+    def transcribe(self, samples: np.ndarray, model_name: str = "base", device: Optional[str] = None) -> List[Dict]:
+        """Transcribe 16 kHz mono float32 samples into segments with word timings."""
+        model = self.load(model_name, device)
+        with self._inference(model_name, device):
+            return timed_segments(self._transcribe(model, samples))
+
+    def _decode_windows(self, model, windows):
+        # No batched decoder: one window at a time
+        return [" ".join(seg["text"].strip() for seg in self._transcribe(model, window)) for window in windows]
+
+    def transcribe_windows(self, windows: List[np.ndarray], model_name: str = "base",
+                           device: Optional[str] = None) -> List[str]:
+        """Text of each window (at most 30 s of samples), decoded as one batch where supported."""
+        model = self.load(model_name, device)
+        with self._inference(model_name, device):
+            return self._decode_windows(model, windows)
+
+    def warm_up(self, model_name: str = "base", device: Optional[str] = None):
+        """Load a model and run it once on silence so the first real job starts fast."""
+        self.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), model_name, device)
+
+    def release(self, model_name: Optional[str] = None, device: Optional[str] = None):
+        """Drop cached models (all of them, or only the given name/device) to free memory."""
+        with self._lock:
+            for key in list(self._models):
+                if model_name is None or key == (model_name, device):
+                    del self._models[key]
+
+
+class WhisperBackend(TranscriptionBackend):
+    """Reference openai-whisper model."""
+
+    name = "whisper"
+
+    def _load(self, model_name, device):
+        import whisper
+        return whisper.load_model(model_name, device=device)
+
+    def _transcribe(self, model, samples):
+        return model.transcribe(samples, task="transcribe", word_timestamps=True)["segments"]
+
+    def _decode_windows(self, model, windows):
+        import torch
+        import whisper
+        # Every window is padded to Whisper's 30 s input, so the encoder and decoder run on one batch
+        mel = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(window), n_mels=model.dims.n_mels)
+                           for window in windows]).to(model.device)
+        options = whisper.DecodingOptions(task="transcribe", without_timestamps=True, fp16=model.device.type == "cuda")
+        return [result.text.strip() for result in model.decode(mel, options)]
+
+    def release(self, model_name=None, device=None):
+        super().release(model_name, device)
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """CTranslate2 Whisper (faster-whisper), quantized for CPU inference."""
+
+    name = "faster-whisper"
+    thread_safe = True
+
+    def __init__(self, compute_type: str = "int8", cpu_threads: int = 0, beam_size: int = 1):
+        """
+        Args:
+            compute_type: CTranslate2 weight type (int8, int8_float32, float32, ...)
+            cpu_threads: Inference threads per model (0 = CTranslate2's default)
+            beam_size: Decoding beam width; 1 is greedy and fastest
+        """
+        super().__init__()
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.beam_size = beam_size
+
+    def cache_params(self, model_name):
+        return (self.name, model_name, self.compute_type, self.beam_size)
+
+    def _load(self, model_name, device):
+        from faster_whisper import WhisperModel
+        return WhisperModel(model_name, device=device or "cpu", compute_type=self.compute_type,
+                            cpu_threads=self.cpu_threads)
+
+    def _transcribe(self, model, samples):
+        segments, _ = model.transcribe(samples, beam_size=self.beam_size, word_timestamps=True)
+        # Segments are produced lazily; consuming the generator runs the decoding
+        return [{"start": seg.start, "end": seg.end, "text": seg.text,
+                 "words": [{"word": w.word, "start": w.start, "end": w.end} for w in seg.words or []]}
+                for seg in segments]
+
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend)}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_transcriber(name: str = DEFAULT_TRANSCRIBER, **options) -> TranscriptionBackend:
+    """Return the shared backend instance for a name and settings.
+
+    Instances (and the models they hold) are reused by every caller asking
+    for the same settings.
+
+    Raises:
+        ValueError: If no backend has that name
+    """
+    name = name or DEFAULT_TRANSCRIBER
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend {name!r} (choose from {', '.join(BACKENDS)})")
+    key = (name, tuple(sorted(options.items())))
+    with _instances_lock:
+        backend = _instances.get(key)
+        if backend is None:
+            backend = _instances[key] = BACKENDS[name](**options)
+        return backend
@@ -0,0 +1,185 @@
+"""
+Batched transcription shared by the jobs of a bulk run.
+
+Transcribing each narration on its own keeps the model busy with a batch of
+one. The service owns one loaded model and a background thread: jobs submit
+their narration samples and get a Future back, and the thread collects the
+narrations waiting at that moment, cuts them into windows of at most 30 s
+(Whisper's input length, cut at pauses so no word is split), and decodes all
+the windows together, batch_size at a time. The text of each window is then
+timed against that window's audio with the script aligner, and the
+windows are stitched back into one segment list per job.
+
+A window the aligner cannot time (e.g. a sung or very fast passage) is
+transcribed again on its own with word timestamps, so results never lose
+timing information; they just cost an extra pass.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from subtitle_aligner import AlignmentError, align_script, speech_regions
+from transcription_backends import DEFAULT_TRANSCRIBER, SAMPLE_RATE, get_transcriber
+
+WINDOW_SECONDS = 30.0
+
+_STOP = object()
+
+
+def split_windows(samples: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                  max_seconds: float = WINDOW_SECONDS) -> List[Tuple[int, int]]:
+    """Cut audio into (start, end) sample ranges of at most max_seconds, at pauses where possible."""
+    limit = int(max_seconds * sample_rate)
+    if len(samples) <= limit:
+        return [(0, len(samples))]
+
+    regions = speech_regions(samples, sample_rate)
+    cut_points = [int((end + next_start) / 2 * sample_rate)
+                  for (_, end), (next_start, _) in zip(regions, regions[1:])]
+    windows, start = [], 0
+    while len(samples) - start > limit:
+        cuts = [cut for cut in cut_points if start < cut <= start + limit]
+        # No pause in range: a hard cut is the only option
+        end = cuts[-1] if cuts else start + limit
+        windows.append((start, end))
+        start = end
+    windows.append((start, len(samples)))
+    return windows
+
+
+@dataclass
+class _Request:
+    samples: np.ndarray
+    windows: List[Tuple[int, int]]
+    future: Future
+
+
+class TranscriptionService:
+    """One shared model transcribing narrations from many jobs in batches."""
+
+    def __init__(self, model_name: str = "base", transcriber: str = DEFAULT_TRANSCRIBER,
+                 transcriber_options: Optional[dict] = None, device: Optional[str] = None,
+                 batch_size: int = 8, max_wait: float = 1.0):
+        """
+        Args:
+            model_name: Whisper model size
+            transcriber: Transcription backend name (see transcription_backends)
+            transcriber_options: Backend settings
+            device: Torch/CTranslate2 device (None = default)
+            batch_size: Windows decoded per model call
+            max_wait: Seconds to wait for more narrations before decoding a partial batch
+        """
+        self.model_name = model_name
+        self.transcriber = transcriber or DEFAULT_TRANSCRIBER
+        self.transcriber_options = dict(transcriber_options or {})
+        self.backend = get_transcriber(self.transcriber, **self.transcriber_options)
+        self.device = device
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def matches(self, model_name: str, transcriber: str, transcriber_options: Optional[dict]) -> bool:
+        """Whether a job with these settings can use this service."""
+        return ((model_name, transcriber or DEFAULT_TRANSCRIBER, dict(transcriber_options or {}))
+                == (self.model_name, self.transcriber, self.transcriber_options))
+
+    def warm_up(self):
+        """Load the model now instead of on the first batch."""
+        self.backend.warm_up(self.model_name, self.device)
+
+    def submit(self, samples: np.ndarray) -> Future:
+        """Queue 16 kHz mono float32 samples; the Future resolves to their segments."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="transcription-service", daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put(_Request(samples, split_windows(samples), future))
+        return future
+
+    def transcribe(self, samples: np.ndarray) -> List[Dict]:
+        """Transcribe samples as part of the next batch and wait for the segments."""
+        return self.submit(samples).result()
+
+    def close(self):
+        """Finish the queued requests and stop the worker thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            request = self._queue.get()
+            if request is _STOP:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            # Gather whatever else arrives until there is a full batch of windows or the wait is over
+            while sum(len(r.windows) for r in batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                    break
+                batch.append(request)
+            self._process([r for r in batch if r.future.set_running_or_notify_cancel()])
+
+    def _process(self, requests: List[_Request]):
+        windows = [(request, start, end) for request in requests for start, end in request.windows]
+        try:
+            texts = []
+            for i in range(0, len(windows), self.batch_size):
+                chunk = [request.samples[start:end] for request, start, end in windows[i:i + self.batch_size]]
+                texts.extend(self.backend.transcribe_windows(chunk, self.model_name, self.device))
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        segments = {id(request): [] for request in requests}
+        for (request, start, end), text in zip(windows, texts):
+            try:
+                segments[id(request)].extend(self._time_window(request.samples[start:end], text, start / SAMPLE_RATE))
+            except Exception as e:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        for request in requests:
+            if not request.future.done():
+                request.future.set_result(segments[id(request)])
+
+    def _time_window(self, samples, text, offset):
+        if not text:
+            return []
+        try:
+            segments = align_script(text, samples, SAMPLE_RATE)
+        except AlignmentError:
+            segments = self.backend.transcribe(samples, self.model_name, self.device)
+        for seg in segments:
+            seg["start"] += offset
+            seg["end"] += offset
+            for word in seg.get("words", []):
+                word["start"] += offset
+                word["end"] += offset
+        return segments
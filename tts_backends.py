@@ -0,0 +1,130 @@
+"""
+Text-to-speech backends.
+
+A backend turns (already censored) text into an audio file. gTTS sends the
+text to Google and returns MP3; espeak-ng runs locally, offline, and writes
+WAV. Backends are registered by name so a job only stores the name, and each
+one reports the settings that change its output so the TTS cache can key on
+them. The rest of the pipeline reads whatever ffmpeg can decode, so backends
+write their native format and report its file extension.
+"""
+
+import shutil
+import subprocess
+from typing import Dict, List
+
+
+class TTSError(RuntimeError):
+    """Raised when a backend is unavailable or fails to synthesize."""
+
+
+class TTSBackend:
+    """Base class for TTS engines."""
+
+    name = ""
+    # Extension (format) of the files synthesize() writes
+    extension = ".wav"
+
+    def available(self) -> bool:
+        """Whether the engine can be used on this machine."""
+        return True
+
+    def cache_params(self, lang: str) -> tuple:
+        """Everything besides the text that affects the output, for cache keys."""
+        return (self.name, lang)
+
+    def synthesize(self, text: str, output_path: str, lang: str = "en") -> str:
+        """Write speech for text to output_path (which ends in self.extension) and return it."""
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS (network, MP3)."""
+
+    name = "gtts"
+    extension = ".mp3"
+
+    def available(self) -> bool:
+        try:
+            import gtts  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def synthesize(self, text, output_path, lang="en"):
+        # Imported here so offline backends work without gTTS installed
+        try:
+            from gtts import gTTS
+        except ImportError as e:
+            raise TTSError("gTTS is not installed (pip install gtts)") from e
+        gTTS(text=text, lang=lang).save(output_path)
+        return output_path
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng speech synthesizer (local, offline, WAV)."""
+
+    name = "espeak-ng"
+    extension = ".wav"
+
+    def __init__(self, words_per_minute: int = 175, voice_variant: str = ""):
+        """
+        Args:
+            words_per_minute: Speaking rate
+            voice_variant: Optional espeak variant appended to the language (e.g. "f3")
+        """
+        self.words_per_minute = words_per_minute
+        self.voice_variant = voice_variant
+
+    def _executable(self):
+        # Older distributions only ship the original espeak, which takes the same options
+        return shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def available(self):
+        return self._executable() is not None
+
+    def cache_params(self, lang):
+        return (self.name, lang, self.words_per_minute, self.voice_variant)
+
+    def synthesize(self, text, output_path, lang="en"):
+        executable = self._executable()
+        if executable is None:
+            raise TTSError("espeak-ng is not installed")
+        voice = f"{lang}+{self.voice_variant}" if self.voice_variant else lang
+        # Text goes in on stdin: long scripts would exceed the command-line limit
+        cmd = [executable, "-v", voice, "-s", str(self.words_per_minute), "-w", output_path, "--stdin"]
+        result = subprocess.run(cmd, input=text.encode("utf-8"), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise TTSError(f"espeak-ng failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return output_path
+
+
+_backends: Dict[str, TTSBackend] = {}
+
+DEFAULT_TTS_BACKEND = "gtts"
+
+
+def register_backend(backend: TTSBackend):
+    """Make a backend selectable by its name (replaces one with the same name)."""
+    _backends[backend.name] = backend
+
+
+def get_backend(name: str = DEFAULT_TTS_BACKEND) -> TTSBackend:
+    """Look up a registered backend.
+
+    Raises:
+        ValueError: If no backend has that name
+    """
+    try:
+        return _backends[name or DEFAULT_TTS_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown TTS backend {name!r} (choose from {', '.join(_backends)})") from None
+
+
+def backend_names(available_only: bool = False) -> List[str]:
+    """Names of the registered backends, optionally only those usable here."""
+    return [name for name, backend in _backends.items() if not available_only or backend.available()]
+
+
+register_backend(GTTSBackend())
+register_backend(EspeakBackend())
@@ -1,52 +1,381 @@
 import os
+import re
+import glob
+import shutil
 import subprocess
+import sys
 import json
-from gtts import gTTS
-from text_censor import default_censor
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from text_censor import DEFAULT_RULE_SET, get_censor
+from disk_cache import DEFAULT_CACHE, DiskCache
+from workspace import JobWorkspace
+from tts_backends import DEFAULT_TTS_BACKEND, get_backend
+from metrics import current_stage
 
 # Ensure intermediate and video folders exist
 os.makedirs("intermediate", exist_ok=True)
 os.makedirs("video", exist_ok=True)
 
-def text_to_speech(txt_file, output_audio="intermediate/input_audio.mp3", lang="en"):
+# Media types picked up from background video and music directories
+VIDEO_EXTENSIONS = ["*.mp4", "*.avi", "*.mov", "*.mkv", "*.wmv"]
+AUDIO_EXTENSIONS = ["*.mp3", "*.wav", "*.m4a", "*.aac"]
+
+# Synthesized narration keyed by (backend and its settings, language, censored text)
+TTS_CACHE_DIR = os.path.join("cache", "tts")
+TTS_CACHE_MAX_BYTES = 2 * 1024 ** 3
+tts_cache = DiskCache(TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES)
+
+# Scripts are synthesized as sentence-aligned chunks of about this many
+# characters, several at a time, then joined without re-encoding
+TTS_CHUNK_CHARS = 400
+TTS_CHUNK_WORKERS = 4
+
+# Whitespace after sentence-ending punctuation, optionally followed by a closing quote/bracket
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?…])\s+|(?<=[.!?…]["\')\]])\s+')
+
+def load_script(txt_file, rule_set=DEFAULT_RULE_SET):
+    """Read a script and return it with censorship applied, as it will be narrated."""
     with open(txt_file, "r", encoding="utf-8") as f:
         text = f.read()
     
-    # Apply censorship to the text
-    censored_text = default_censor.censor_text(text)
+    # Apply censorship and collect what was censored in the same pass
+    result = get_censor(rule_set).censor(text)
+    if result.hits:
+        print(f"Censored words found: {', '.join(hit.word for hit in result.hits)}")
     
-    # Check if any words were censored and log if needed
-    flagged_words = default_censor.find_flagged_words(text)
-    if flagged_words:
-        print(f"Censored words found: {', '.join(flagged_words)}")
-    
-    tts = gTTS(text=censored_text, lang=lang)
-    tts.save(output_audio)
+    return result.text
+
+def _tts_key(text, lang, backend):
+    return DiskCache.make_key(*backend.cache_params(lang), text)
+
+def speak_text(text, output_audio="intermediate/input_audio.mp3", lang="en", cache=DEFAULT_CACHE, backend=DEFAULT_TTS_BACKEND):
+    """Synthesize already-censored text to an audio file.
+
+    Identical text is only synthesized once: results are stored in the TTS
+    cache (tts_cache unless another cache is given) and copied out on later
+    calls. Pass cache=None to always synthesize.
+
+    Returns:
+        Path of the audio file: output_audio with the extension of the
+        backend's native format (.mp3 for gTTS, .wav for espeak-ng)
+    """
+    cache = tts_cache if cache is DEFAULT_CACHE else cache
+    backend = get_backend(backend)
+    output_audio = os.path.splitext(output_audio)[0] + backend.extension
+    key = _tts_key(text, lang, backend)
+    cached = cache.get(key, backend.extension) if cache else None
+    if cached:
+        shutil.copyfile(cached, output_audio)
+        return output_audio
+
+    backend.synthesize(text, output_audio, lang)
+    if cache:
+        cache.put(key, output_audio, backend.extension)
     return output_audio
 
-def speed_up_audio(input_audio, output_audio="intermediate/fast_audio.mp3", factor=1.5):
+def split_tts_chunks(text, max_chars=TTS_CHUNK_CHARS):
+    """Split text at sentence ends into chunks of at most max_chars (longer sentences stay whole)."""
+    chunks, current = [], ""
+    for sentence in _SENTENCE_BREAK.split(text.strip()):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def concat_audio(parts, output_audio):
+    """Join audio files of identical format with the concat demuxer (stream copy, no re-encode)."""
+    list_path = output_audio + ".txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for part in parts:
+            # Paths are quoted; a quote inside one is closed, escaped and reopened
+            escaped = os.path.abspath(part).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        run_ffmpeg(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_audio])
+    finally:
+        os.remove(list_path)
+    return output_audio
+
+def synthesize_narration(text, output_audio="intermediate/input_audio.mp3", lang="en", cache=DEFAULT_CACHE,
+                         backend=DEFAULT_TTS_BACKEND, workers=TTS_CHUNK_WORKERS):
+    """Synthesize a script sentence chunk by sentence chunk, concurrently, and join the pieces.
+
+    Each chunk is its own TTS request and cache entry, so a long script isn't
+    one slow request, and a failed run only has to redo the chunks that were
+    not cached yet. The joined narration is cached too, with its chunk
+    timings.
+
+    Returns:
+        (audio_path, chunks) where chunks is a list of {"text", "start", "end"}
+        giving where each piece of the script is spoken in the audio
+    """
+    cache = tts_cache if cache is DEFAULT_CACHE else cache
+    tts_backend = get_backend(backend)
+    output_audio = os.path.splitext(output_audio)[0] + tts_backend.extension
+    key = _tts_key(text, lang, tts_backend)
+    if cache:
+        cached = cache.get(key, tts_backend.extension)
+        if cached:
+            shutil.copyfile(cached, output_audio)
+            chunks = cache.get_json(key)
+            if chunks is None:
+                # Narration cached as a whole, before chunk timings were recorded
+                chunks = [{"text": text, "start": 0.0, "end": get_audio_duration(output_audio)}]
+            return output_audio, chunks
+
+    pieces = split_tts_chunks(text) or [text]
+    stem = os.path.splitext(output_audio)[0]
+
+    def synthesize(index, piece):
+        path = speak_text(piece, f"{stem}_part{index:03d}", lang, cache, tts_backend.name)
+        return path, get_audio_duration(path)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pieces)))) as pool:
+        parts = list(pool.map(synthesize, range(len(pieces)), pieces))
+
+    chunks, start = [], 0.0
+    for piece, (_, duration) in zip(pieces, parts):
+        chunks.append({"text": piece, "start": start, "end": start + duration})
+        start += duration
+
+    paths = [path for path, _ in parts]
+    try:
+        if len(paths) == 1:
+            shutil.copyfile(paths[0], output_audio)
+        else:
+            concat_audio(paths, output_audio)
+    finally:
+        for path in paths:
+            os.remove(path)
+    if cache:
+        # Stored under the whole-text key even for a single chunk: split_tts_chunks
+        # normalizes whitespace, so the chunk's own key usually differs from it
+        cache.put(key, output_audio, tts_backend.extension)
+        cache.put_json(key, chunks)
+    return output_audio, chunks
+
+def text_to_speech(txt_file, output_audio="intermediate/input_audio.mp3", lang="en", cache=DEFAULT_CACHE, backend=DEFAULT_TTS_BACKEND):
+    return speak_text(load_script(txt_file), output_audio, lang, cache, backend)
+
+def prepopulate_tts_cache(script_dir, lang="en", workers=4, cache=DEFAULT_CACHE, rule_set=DEFAULT_RULE_SET, backend=DEFAULT_TTS_BACKEND):
+    """Synthesize every script in a directory into the TTS cache ahead of rendering.
+
+    Returns:
+        Number of scripts that had to be synthesized (the rest were already cached)
+    """
+    cache = tts_cache if cache is DEFAULT_CACHE else cache
+    scripts = sorted(glob.glob(os.path.join(script_dir, "*.txt")))
+    tts_backend = get_backend(backend)
+
+    with JobWorkspace(prefix="tts_prefill_") as workspace:
+        def fill(index, script):
+            text = load_script(script, rule_set)
+            if cache.get(_tts_key(text, lang, tts_backend), tts_backend.extension):
+                return 0
+            os.remove(synthesize_narration(text, workspace.path_for(f"prefill_{index}"), lang, cache,
+                                           tts_backend.name, workers=1)[0])
+            return 1
+
+        # Remote synthesis is network-bound and local engines run as subprocesses, so threads are enough
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(fill, range(len(scripts)), scripts))
+
+# ffmpeg processes currently running, so a cancel request can stop them mid-render
+_active_processes = set()
+_active_lock = threading.Lock()
+
+# Lines of ffmpeg output quoted in the error when a run fails
+FFMPEG_ERROR_LINES = 5
+
+class FFmpegError(subprocess.CalledProcessError):
+    """A failed ffmpeg run whose message ends with the last lines ffmpeg printed."""
+
+    def __str__(self):
+        text = self.stderr.decode("utf-8", "replace") if isinstance(self.stderr, bytes) else self.stderr or ""
+        # Progress updates are separated by carriage returns; keep only real lines
+        lines = [line.strip() for line in re.split(r"[\r\n]+", text) if line.strip() and not line.startswith("bench:")]
+        tail = " | ".join(lines[-FFMPEG_ERROR_LINES:])
+        return f"{super().__str__()} ffmpeg: {tail}" if tail else super().__str__()
+
+def _tee_stderr(stream, sink):
+    # Echo ffmpeg's output (progress included) as it arrives, keeping a copy to parse
+    chunks = []
+    while True:
+        chunk = stream.read1(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if sink is not None:
+            sink.write(chunk)
+            sink.flush()
+    return b"".join(chunks)
+
+def run_ffmpeg(cmd, capture_output=False):
+    """Run an ffmpeg command like subprocess.run(cmd, check=True), but cancellable.
+
+    The process is registered while it runs so terminate_processes() can
+    kill it from another thread (e.g. the GUI's Cancel button). Inside a
+    measured stage (see metrics) ffmpeg also reports its speed, CPU time and
+    memory, which are added to the stage's record; its output is still shown
+    on the console as it runs.
+
+    Raises:
+        FFmpegError: If ffmpeg exits with an error; when its output was
+            captured, the message includes the last lines of it
+    """
+    stage = current_stage()
+    measured = stage is not None and cmd[0] == "ffmpeg"
+    if measured:
+        cmd = [cmd[0], "-benchmark", *cmd[1:]]
+    pipe = subprocess.PIPE if capture_output else None
+    process = subprocess.Popen(cmd, stdout=pipe, stderr=subprocess.PIPE if measured else pipe)
+    with _active_lock:
+        _active_processes.add(process)
+    try:
+        if measured and not capture_output:
+            stdout, stderr = None, _tee_stderr(process.stderr, getattr(sys.stderr, "buffer", None))
+            process.wait()
+        else:
+            stdout, stderr = process.communicate()
+    finally:
+        with _active_lock:
+            _active_processes.discard(process)
+    if measured:
+        stage.add_ffmpeg(stderr)
+    if process.returncode != 0:
+        raise FFmpegError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+def terminate_processes():
+    """Kill every ffmpeg process started through run_ffmpeg that is still running."""
+    with _active_lock:
+        processes = list(_active_processes)
+    for process in processes:
+        try:
+            process.kill()
+        except OSError:
+            pass
+    return len(processes)
+
+def speed_up_audio(input_audio, output_audio="intermediate/fast_audio.wav", factor=1.5):
+    # A .wav output is PCM, so this intermediate costs no extra lossy encode
     cmd = ["ffmpeg", "-y", "-i", input_audio, "-filter:a", f"atempo={factor}", output_audio]
-    subprocess.run(cmd, check=True)
+    run_ffmpeg(cmd)
     return output_audio
 
-def get_video_duration(video_path):
-    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", video_path]
+class ProbeError(RuntimeError):
+    """Raised when ffprobe fails or reports something unusable for a file."""
+
+
+# probe_media results keyed by (path, mtime, size); a changed file gets re-probed
+_probe_cache = {}
+_probe_lock = threading.Lock()
+
+def _parse_rate(rate):
+    try:
+        num, den = rate.split("/")
+        return float(num) / float(den) if float(den) else None
+    except (AttributeError, ValueError):
+        return None
+
+def _run_ffprobe(path):
+    cmd = ["ffprobe", "-v", "error", "-show_format", "-show_streams", "-of", "json", path]
     result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    info = json.loads(result.stdout)
-    return float(info["format"]["duration"])
+    if result.returncode != 0:
+        raise ProbeError(f"ffprobe failed for {path}: {result.stderr.strip() or f'exit code {result.returncode}'}")
+    try:
+        info = json.loads(result.stdout)
+        duration = float(info["format"]["duration"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ProbeError(f"ffprobe reported no usable duration for {path}") from e
+
+    streams = info.get("streams", [])
+    video = next((st for st in streams if st.get("codec_type") == "video"
+                  and not st.get("disposition", {}).get("attached_pic")), None) or {}
+    audio = next((st for st in streams if st.get("codec_type") == "audio"), None) or {}
+    return {
+        "duration": duration,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": _parse_rate(video.get("avg_frame_rate")),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "sample_rate": int(audio["sample_rate"]) if audio.get("sample_rate") else None,
+        "channels": audio.get("channels"),
+    }
+
+def probe_media(path):
+    """Return format and stream info for a media file from a single ffprobe run.
+
+    Results are memoized per (path, mtime, size), so probing the same
+    unchanged file again is free.
+
+    Returns:
+        Dict with duration, width, height, fps, video_codec, audio_codec,
+        sample_rate and channels (stream fields are None when absent)
+
+    Raises:
+        ProbeError: If ffprobe fails or reports no duration
+    """
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise ProbeError(f"Cannot probe {path}: {e}") from e
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _probe_lock:
+        info = _probe_cache.get(key)
+    if info is None:
+        info = _run_ffprobe(path)
+        with _probe_lock:
+            _probe_cache[key] = info
+    return dict(info)
+
+def probe_many(paths, workers=8):
+    """Probe many files concurrently.
+
+    Returns:
+        Dict mapping each path to its info dict, or to the ProbeError it raised
+    """
+    def probe(path):
+        try:
+            return probe_media(path)
+        except ProbeError as e:
+            return e
+
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(probe, paths)))
+
+def get_video_duration(video_path):
+    return probe_media(video_path)["duration"]
 
 def get_audio_duration(audio_path):
-    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", audio_path]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    info = json.loads(result.stdout)
-    return float(info["format"]["duration"])
+    return probe_media(audio_path)["duration"]
+
+# Rate of the in-memory narration buffer: what Whisper and the aligner expect
+PCM_SAMPLE_RATE = 16000
+
+def decode_audio_pcm(audio_path, sample_rate=PCM_SAMPLE_RATE):
+    """Decode any audio file to mono float32 samples in [-1, 1] at the given rate."""
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-i", audio_path,
+           "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    result = run_ffmpeg(cmd, capture_output=True)
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
 
-def create_censored_text_file(input_file, output_file=None):
+def create_censored_text_file(input_file, output_file=None, rule_set=DEFAULT_RULE_SET):
     """Create a censored version of a text file.
     
     Args:
         input_file: Path to original text file
         output_file: Path for censored file (optional, defaults to input_file with _censored suffix)
+        rule_set: Censorship rule set name or path
     
     Returns:
         Path to the censored file
@@ -59,15 +388,14 @@ def create_censored_text_file(input_file, output_file=None):
         original_text = f.read()
     
     # Apply censorship
-    censored_text = default_censor.censor_text(original_text)
+    result = get_censor(rule_set).censor(original_text)
     
     # Write censored version
     with open(output_file, "w", encoding="utf-8") as f:
-        f.write(censored_text)
+        f.write(result.text)
     
     # Log censored words if any
-    flagged_words = default_censor.find_flagged_words(original_text)
-    if flagged_words:
-        print(f"Censored in {os.path.basename(input_file)}: {', '.join(flagged_words)}")
+    if result.hits:
+        print(f"Censored in {os.path.basename(input_file)}: {', '.join(hit.word for hit in result.hits)}")
     
     return output_file
\ No newline at end of file
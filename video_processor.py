@@ -1,55 +1,164 @@
 import os
 import random
 import subprocess
-import whisper
-from utils import get_video_duration, get_audio_duration, speed_up_audio
+from utils import get_video_duration, get_audio_duration, speed_up_audio, decode_audio_pcm, probe_media, ProbeError, run_ffmpeg, PCM_SAMPLE_RATE
+from background_pool import TIKTOK_VIDEO_FILTER, is_normalized
+from media_library import get_library
+from subtitle_aligner import align_script, align_chunks, AlignmentError, ALIGN_SAMPLE_RATE
+from disk_cache import DEFAULT_CACHE, DiskCache, hash_file
+from encoder_profiles import DEFAULT_PROFILE, get_profile
+from transcription_backends import DEFAULT_TRANSCRIBER, get_transcriber
 
 # Ensure intermediate and video folders exist
 os.makedirs("intermediate", exist_ok=True)
 os.makedirs("video", exist_ok=True)
 
-def prepare_video(video_path, audio_path, output_path="intermediate/tiktok_video.mp4", youtube_mode=False):
-    video_duration = get_video_duration(video_path)
+# Video codecs that can be stream-copied into the MP4 output
+MP4_COPY_CODECS = ("h264",)
+
+def choose_start(video_path, needed_duration, video_duration=None):
+    """Pick where to start reading the background video.
+
+    Starts are chosen among the file's keyframes (from the media library's
+    cached keyframe index) so seeking needs no decode-and-discard and a
+    stream copy cuts exactly at the start. Looping is only used when the clip
+    is shorter than what's needed.
+
+    Returns:
+        (start_time, loop) tuple
+    """
+    video_duration = video_duration or get_video_duration(video_path)
+    if video_duration < needed_duration:
+        # Too short: loop the whole clip from the beginning
+        return 0.0, True
+
+    max_start = video_duration - needed_duration
+    try:
+        keyframes = get_library().keyframes(video_path)
+    except (OSError, ProbeError):
+        keyframes = []
+    if keyframes:
+        # Keyframe timestamps are relative to the container start, as -ss expects
+        base = keyframes[0]
+        candidates = [k - base for k in keyframes if k - base <= max_start]
+        if candidates:
+            return random.choice(candidates), False
+    return (random.uniform(0, max_start) if max_start > 0 else 0.0), False
+
+def _background_input(video_path, start_time, loop):
+    args = ["-stream_loop", "-1"] if loop else []
+    if start_time > 0:
+        args += ["-ss", f"{start_time:.3f}"]
+    return args + ["-i", video_path]
+
+def prepare_video(video_path, audio_path, output_path="intermediate/tiktok_video.mp4", youtube_mode=False, video_duration=None, profile=DEFAULT_PROFILE):
+    profile = get_profile(profile)
+    # Callers that already know the duration (e.g. from the media library) skip the probe
+    video_duration = video_duration or get_video_duration(video_path)
     audio_duration = get_audio_duration(audio_path)
-    max_start = max(0, video_duration - audio_duration)
-    start_time = random.uniform(0, max_start) if max_start > 0 else 0
+    start_time, loop = choose_start(video_path, audio_duration, video_duration)
+    info = probe_media(video_path)
 
-    if youtube_mode:
+    if youtube_mode and not loop and info["video_codec"] in MP4_COPY_CODECS:
+        # YouTube mode keeps the source format, so a keyframe-aligned span is copied as is
+        video_args = ["-c:v", "copy"]
+    elif youtube_mode:
         # YouTube mode: preserve original video format and dimensions
-        cmd = [
-            "ffmpeg", "-y",
-            "-stream_loop", "-1",
-            "-ss", str(start_time),
-            "-i", video_path,
-            "-i", audio_path,
-            "-map", "0:v:0", "-map", "1:a:0",
-            "-c:v", "libx264", "-preset", "slow", "-crf", "20",
-            "-c:a", "aac", "-b:a", "192k",
-            "-shortest",
-            output_path
-        ]
+        video_args = profile.video_args()
+    elif is_normalized(info) and not loop:
+        # TikTok mode, pooled background: already vertical 1080x1920@30, so the span is copied
+        video_args = ["-c:v", "copy"]
     else:
         # TikTok mode: convert to vertical format
-        cmd = [
-            "ffmpeg", "-y",
-            "-stream_loop", "-1",
-            "-ss", str(start_time),
-            "-i", video_path,
-            "-i", audio_path,
+        video_args = [
             "-vf", "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,setsar=1",
-            "-map", "0:v:0", "-map", "1:a:0",
-            "-c:v", "libx264", "-preset", "slow", "-crf", "20", "-r", "30",
-            "-c:a", "aac", "-b:a", "192k",
-            "-shortest",
-            output_path
+            *profile.video_args(), "-r", "30",
         ]
-    subprocess.run(cmd, check=True)
+
+    cmd = [
+        "ffmpeg", "-y",
+        *_background_input(video_path, start_time, loop),
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        *video_args,
+        *profile.audio_args(),
+        "-shortest",
+        output_path
+    ]
+    run_ffmpeg(cmd)
     return output_path
 
-def transcribe_and_chunk(audio_path, ass_path="intermediate/output.ass", chunk_size=3, font="Impact", font_size=72, color="#00FFFF", youtube_mode=False):
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_path, task="transcribe")
+# Timed transcripts keyed by audio content and model, so subtitles can be
+# restyled (chunk size, font, colour, layout) without transcribing again
+TRANSCRIPT_CACHE_DIR = os.path.join("cache", "transcripts")
+TRANSCRIPT_CACHE_MAX_BYTES = 256 * 1024 ** 2
+transcript_cache = DiskCache(TRANSCRIPT_CACHE_DIR, max_bytes=TRANSCRIPT_CACHE_MAX_BYTES)
+
+def get_whisper_model(model_name="base", device=None):
+    """Return the cached openai-whisper model, loading it on first use."""
+    return get_transcriber("whisper").load(model_name, device)
+
+def warm_up_whisper(model_name="base", device=None, transcriber=DEFAULT_TRANSCRIBER, transcriber_options=None):
+    """Load a model ahead of time and run it once on silence so the first real job starts fast."""
+    get_transcriber(transcriber, **(transcriber_options or {})).warm_up(model_name, device)
+
+def release_whisper_models(model_name=None, device=None, transcriber=DEFAULT_TRANSCRIBER, transcriber_options=None):
+    """Drop cached models (all of them, or only the given name/device) to free memory."""
+    get_transcriber(transcriber, **(transcriber_options or {})).release(model_name, device)
+
+def _ass_time(t):
+    h = int(t//3600)
+    m = int((t%3600)//60)
+    s = int(t%60)
+    cs = int((t%1)*100)
+    return f"{h:d}:{m:02d}:{s:02d}.{cs:02d}"
+
+def _segment_chunks(seg, chunk_size):
+    """Yield (start, end, text) subtitle chunks for one segment.
+
+    Segments carrying per-word timings ("words": [{"word", "start", "end"}])
+    are cut on word boundaries; plain segments are split evenly, as Whisper
+    segment timings only cover the whole line.
+    """
+    timed_words = seg.get("words")
+    if timed_words:
+        for i in range(0, len(timed_words), chunk_size):
+            group = timed_words[i:i+chunk_size]
+            # Hold each chunk on screen until the next one starts
+            chunk_end = timed_words[i+chunk_size]["start"] if i + chunk_size < len(timed_words) else seg["end"]
+            yield group[0]["start"], chunk_end, " ".join(w["word"].strip() for w in group)
+        return
+
+    words = seg["text"].strip().split()
+    start, end = seg["start"], seg["end"]
+    total_chunks = max(1, (len(words) + chunk_size - 1) // chunk_size)
+    duration = (end - start) / total_chunks
 
+    i = 0
+    while i < len(words):
+        chunk = " ".join(words[i:i+chunk_size])
+        chunk_index = i // chunk_size
+        chunk_start = start + chunk_index * duration
+        yield chunk_start, chunk_start + duration, chunk
+        i += chunk_size
+
+def _scale_segments(segments, factor):
+    scaled = []
+    for seg in segments:
+        seg = dict(seg, start=seg["start"] * factor, end=seg["end"] * factor)
+        if seg.get("words"):
+            seg["words"] = [dict(w, start=w["start"] * factor, end=w["end"] * factor) for w in seg["words"]]
+        scaled.append(seg)
+    return scaled
+
+def write_ass(segments, ass_path="intermediate/output.ass", chunk_size=3, font="Impact", font_size=72, color="#00FFFF", youtube_mode=False, tempo=1.0):
+    """Write timed segments as an ASS subtitle file, chunk_size words per event.
+
+    tempo is the speed-up applied to the narration when rendering; segment
+    timings (taken on the original narration) are compressed to match.
+    """
+    if tempo != 1.0:
+        segments = _scale_segments(segments, 1.0 / tempo)
     # Set resolution and margins based on mode
     if youtube_mode:
         # YouTube mode: use standard 16:9 resolution
@@ -75,34 +184,105 @@ Style: Centered,{font},{font_size},&H{color[1:]}&, &H000000&, &H000000&,1,0,1,4,
 Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
 """)
 
-        for seg in result["segments"]:
-            words = seg["text"].strip().split()
-            start, end = seg["start"], seg["end"]
-            total_chunks = max(1, (len(words) + chunk_size - 1) // chunk_size)
-            duration = (end - start) / total_chunks
-
-            i = 0
-            while i < len(words):
-                chunk = " ".join(words[i:i+chunk_size])
-                chunk_index = i // chunk_size
-                chunk_start = start + chunk_index * duration
-                chunk_end = chunk_start + duration
-
-                def fmt(t):
-                    h = int(t//3600)
-                    m = int((t%3600)//60)
-                    s = int(t%60)
-                    cs = int((t%1)*100)
-                    return f"{h:d}:{m:02d}:{s:02d}.{cs:02d}"
-
-                f.write(f"Dialogue: 0,{fmt(chunk_start)},{fmt(chunk_end)},Centered,,0,0,0,,{chunk}\n")
-                i += chunk_size
+        for seg in segments:
+            for chunk_start, chunk_end, chunk in _segment_chunks(seg, chunk_size):
+                # Braces would be read as ASS override tags
+                chunk = chunk.replace("{", "(").replace("}", ")")
+                f.write(f"Dialogue: 0,{_ass_time(chunk_start)},{_ass_time(chunk_end)},Centered,,0,0,0,,{chunk}\n")
     return ass_path
 
-def burn_subtitles(video_path, ass_path, bg_music=None, bg_speed=1.0, output_path="video/final_tiktok.mp4"):
+def transcribe_audio(audio_path, model_name="base", device=None, cache=DEFAULT_CACHE, samples=None,
+                     transcriber=DEFAULT_TRANSCRIBER, transcriber_options=None, service=None):
+    """Transcribe narration into segments with word timings, reusing cached transcripts.
+
+    Args:
+        audio_path: Narration audio (its hash keys the cache)
+        model_name: Whisper model size
+        device: Torch/CTranslate2 device (None = default)
+        cache: Transcript cache (default transcript_cache, None to always transcribe)
+        samples: The narration already decoded to 16 kHz mono float32 (skips a decode)
+        transcriber: Transcription backend name (see transcription_backends)
+        transcriber_options: Backend settings, e.g. {"cpu_threads": 4, "beam_size": 1}
+        service: Optional TranscriptionService with the same settings; the
+            narration is then decoded in a batch with other jobs' narrations
+
+    Returns:
+        List of {"start", "end", "text", "words": [{"word", "start", "end"}]} segments
+    """
+    cache = transcript_cache if cache is DEFAULT_CACHE else cache
+    backend = get_transcriber(transcriber, **(transcriber_options or {}))
+    # Batched transcripts are timed differently, so they are cached separately
+    mode = ("batched",) if service is not None else ()
+    key = DiskCache.make_key(*backend.cache_params(model_name), *mode, hash_file(audio_path))
+    segments = cache.get_json(key) if cache else None
+    if segments is None:
+        if samples is None:
+            samples = decode_audio_pcm(audio_path, PCM_SAMPLE_RATE)
+        if service is not None:
+            segments = service.transcribe(samples)
+        else:
+            segments = backend.transcribe(samples, model_name, device)
+        if cache:
+            cache.put_json(key, segments)
+    return segments
+
+def align_audio(script_text, audio_path, cache=DEFAULT_CACHE, chunks=None, samples=None):
+    """Align a known script to narration audio, reusing cached alignments.
+
+    Args:
+        script_text: The narrated text
+        audio_path: Narration audio
+        cache: Transcript cache (default transcript_cache, None to always align)
+        chunks: Optional [{"text", "start", "end"}] spans from chunked synthesis;
+            each is aligned within its own span
+        samples: The narration already decoded to 16 kHz mono float32 (skips a decode)
+
+    Raises:
+        AlignmentError: If the script doesn't fit the audio
+    """
+    cache = transcript_cache if cache is DEFAULT_CACHE else cache
+    spans = [(round(c["start"], 3), round(c["end"], 3)) for c in chunks] if chunks else None
+    key = DiskCache.make_key("align", script_text, hash_file(audio_path), spans)
+    segments = cache.get_json(key) if cache else None
+    if segments is None:
+        if samples is None:
+            samples = decode_audio_pcm(audio_path, ALIGN_SAMPLE_RATE)
+        if chunks and len(chunks) > 1:
+            segments = align_chunks(chunks, samples, ALIGN_SAMPLE_RATE)
+        else:
+            segments = align_script(script_text, samples, ALIGN_SAMPLE_RATE)
+        if cache:
+            cache.put_json(key, segments)
+    return segments
+
+def transcribe_and_chunk(audio_path, ass_path="intermediate/output.ass", chunk_size=3, font="Impact", font_size=72, color="#00FFFF", youtube_mode=False, model_name="base", device=None, tempo=1.0, samples=None, transcriber=DEFAULT_TRANSCRIBER, transcriber_options=None, service=None):
+    segments = transcribe_audio(audio_path, model_name, device, samples=samples, transcriber=transcriber,
+                                transcriber_options=transcriber_options, service=service)
+    return write_ass(segments, ass_path, chunk_size, font, font_size, color, youtube_mode, tempo)
+
+def align_and_chunk(script_text, audio_path, ass_path="intermediate/output.ass", chunk_size=3, font="Impact", font_size=72, color="#00FFFF", youtube_mode=False, model_name="base", device=None, narration_chunks=None, tempo=1.0, samples=None, transcriber=DEFAULT_TRANSCRIBER, transcriber_options=None, service=None):
+    """Time the known script against the narration and write the ASS file.
+
+    Falls back to Whisper transcription when the script cannot be aligned
+    (empty text, silent or undecodable audio, implausible speaking rate).
+    narration_chunks, from chunked synthesis, pin the alignment to the known
+    chunk boundaries. tempo is as for write_ass; samples is the decoded
+    narration, shared with the Whisper fallback, and service the optional
+    batched TranscriptionService the fallback uses.
+    """
+    try:
+        segments = align_audio(script_text, audio_path, chunks=narration_chunks, samples=samples)
+    except (AlignmentError, subprocess.CalledProcessError) as e:
+        print(f"Script alignment failed ({e}), falling back to Whisper")
+        return transcribe_and_chunk(audio_path, ass_path, chunk_size, font, font_size, color, youtube_mode, model_name, device, tempo, samples,
+                                    transcriber, transcriber_options, service)
+    return write_ass(segments, ass_path, chunk_size, font, font_size, color, youtube_mode, tempo)
+
+def burn_subtitles(video_path, ass_path, bg_music=None, bg_speed=1.0, output_path="video/final_tiktok.mp4", work_dir="intermediate", profile=DEFAULT_PROFILE):
+    profile = get_profile(profile)
     if bg_music:
         # Adjust background music speed
-        tmp_music = "intermediate/bg_temp.mp3"
+        tmp_music = os.path.join(work_dir, "bg_temp.wav")
         if bg_speed != 1.0:
             speed_up_audio(bg_music, tmp_music, factor=bg_speed)
             bg_music = tmp_music
@@ -111,10 +291,10 @@ def burn_subtitles(video_path, ass_path, bg_music=None, bg_speed=1.0, output_pat
             "ffmpeg", "-y",
             "-i", video_path,
             "-stream_loop", "-1", "-i", bg_music,
-            "-vf", f"ass={ass_path}",
+            "-vf", f"ass={_filter_path(ass_path)}",
             "-filter_complex", "[1:a]volume=0.25[a1];[0:a][a1]amix=inputs=2:duration=first:dropout_transition=3[aout]",
             "-map", "0:v", "-map", "[aout]",
-            "-c:v", "libx264", "-c:a", "aac", "-b:a", "192k",
+            *profile.video_args(), *profile.audio_args(),
             "-shortest",
             output_path
         ]
@@ -122,9 +302,97 @@ def burn_subtitles(video_path, ass_path, bg_music=None, bg_speed=1.0, output_pat
         cmd = [
             "ffmpeg", "-y",
             "-i", video_path,
-            "-vf", f"ass={ass_path}",
-            "-c:v", "libx264", "-c:a", "aac", "-b:a", "128k",
+            "-vf", f"ass={_filter_path(ass_path)}",
+            *profile.video_args(), *profile.audio_args(),
             output_path
         ]
-    subprocess.run(cmd, check=True)
-    return output_path
\ No newline at end of file
+    run_ffmpeg(cmd)
+    return output_path
+
+def _filter_path(path):
+    # A path in a filter's arguments is unescaped twice: first by the filtergraph
+    # parser (',', ';', '[', ']' and quotes are special there), then as an option
+    # value (':' separates options, e.g. after a Windows drive letter)
+    value = path.replace("\\", "/")
+    for char in "':=":
+        value = value.replace(char, "\\" + char)
+    for char in "\\',;[]":
+        value = value.replace(char, "\\" + char)
+    return value
+
+def _atempo_chain(factor):
+    # Older ffmpeg builds limit a single atempo to 0.5-2.0, so chain steps for larger factors
+    steps = []
+    while factor > 2.0:
+        steps.append("atempo=2.0")
+        factor /= 2.0
+    while factor < 0.5:
+        steps.append("atempo=0.5")
+        factor /= 0.5
+    steps.append(f"atempo={factor}")
+    return ",".join(steps)
+
+def render_single_pass(video_path, audio_path, ass_path, output_path="video/final_tiktok.mp4", bg_music=None, bg_speed=1.0, youtube_mode=False, narration_tempo=None, video_duration=None, profile=DEFAULT_PROFILE, max_duration=None, scale=None, audio_duration=None):
+    """Render the final video with a single ffmpeg encode.
+
+    Combines what prepare_video and burn_subtitles do in two encodes: seek/loop
+    the background, scale and crop it (TikTok layout), burn the ASS subtitles
+    and mix narration with background music, all in one filtergraph.
+
+    Args:
+        video_path: Background video
+        audio_path: Narration audio
+        ass_path: Subtitles timed against the final (sped-up) narration
+        output_path: Where to write the finished video
+        bg_music: Optional background music, looped under the narration
+        bg_speed: Speed factor for the background music
+        youtube_mode: Keep the source dimensions instead of the vertical layout
+        narration_tempo: Optional speed factor applied to the narration in the graph
+        video_duration: Background duration if already known (skips a probe)
+        profile: Encoder profile name or EncoderProfile
+        max_duration: Only render this many seconds from the start (previews)
+        scale: Shrink the output by this factor, e.g. 0.5 (previews)
+        audio_duration: Narration duration before the tempo change, if already known (skips a probe)
+
+    Returns:
+        Path to the rendered video
+    """
+    profile = get_profile(profile)
+    tempo = narration_tempo or 1.0
+    audio_duration = (audio_duration or get_audio_duration(audio_path)) / tempo
+    start_time, loop = choose_start(video_path, audio_duration, video_duration)
+    output_duration = min(audio_duration, max_duration) if max_duration else audio_duration
+
+    video_chain = f"ass={_filter_path(ass_path)}"
+    if scale:
+        # Subtitles are laid out in PlayRes coordinates, so libass draws them to the shrunken frame
+        video_chain = f"scale=trunc(iw*{scale}/2)*2:trunc(ih*{scale}/2)*2,{video_chain}"
+    # Pooled backgrounds are already in the TikTok layout; only the subtitles need drawing
+    if not youtube_mode and not is_normalized(probe_media(video_path)):
+        video_chain = f"{TIKTOK_VIDEO_FILTER},{video_chain}"
+    graph = [f"[0:v]{video_chain}[vout]"]
+    graph.append(f"[1:a]{_atempo_chain(tempo) if tempo != 1.0 else 'anull'}[narr]")
+
+    cmd = [
+        "ffmpeg", "-y",
+        *_background_input(video_path, start_time, loop),
+        "-i", audio_path,
+    ]
+    if bg_music:
+        cmd += ["-stream_loop", "-1", "-i", bg_music]
+        music_chain = f"{_atempo_chain(bg_speed)}," if bg_speed != 1.0 else ""
+        graph.append(f"[2:a]{music_chain}volume=0.25[a1]")
+        graph.append("[narr][a1]amix=inputs=2:duration=first:dropout_transition=3[aout]")
+    else:
+        graph.append("[narr]anull[aout]")
+
+    cmd += [
+        "-filter_complex", ";".join(graph),
+        "-map", "[vout]", "-map", "[aout]",
+        *profile.video_args(),
+        *profile.audio_args(),
+        "-t", f"{output_duration:.3f}",
+        output_path
+    ]
+    run_ffmpeg(cmd)
+    return output_path
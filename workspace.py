@@ -0,0 +1,123 @@
+"""
+Per-job scratch workspaces.
+
+Each render writes its intermediates (narration, sped-up audio, subtitles,
+prepared background) into a directory of its own, so concurrent jobs never
+overwrite each other's files. A workspace is deleted when its job succeeds
+and kept when it fails, for debugging. Kept workspaces are bounded by a disk
+budget: once the workspace root grows past it, the oldest failed workspaces
+are removed first.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+WORKSPACE_ROOT = "intermediate"
+# RAM-backed scratch space; intermediates are small compared to the final video
+TMPFS_ROOT = "/dev/shm/tiktok_video_maker"
+WORKSPACE_BUDGET_BYTES = 5 * 1024 ** 3
+
+# Written into workspaces kept after a failure; only those are ever evicted
+FAILED_MARKER = ".failed"
+
+
+def workspace_root(use_tmpfs: bool = False, root: str = WORKSPACE_ROOT) -> str:
+    """Directory new workspaces are created in: tmpfs when requested and available, else root."""
+    if use_tmpfs and os.path.isdir(os.path.dirname(TMPFS_ROOT)):
+        return TMPFS_ROOT
+    return root
+
+
+def _tree_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except FileNotFoundError:
+                continue
+    return total
+
+
+def failed_workspaces(root: str = WORKSPACE_ROOT) -> List[Tuple[str, int, float]]:
+    """Kept workspaces under root as (path, bytes, failed_at), oldest first."""
+    kept = []
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return kept
+    for name in names:
+        marker = os.path.join(root, name, FAILED_MARKER)
+        try:
+            failed_at = os.path.getmtime(marker)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        path = os.path.join(root, name)
+        kept.append((path, _tree_size(path), failed_at))
+    return sorted(kept, key=lambda entry: entry[2])
+
+
+def enforce_budget(root: str = WORKSPACE_ROOT, max_bytes: Optional[int] = WORKSPACE_BUDGET_BYTES) -> int:
+    """Delete the oldest failed workspaces until root fits in max_bytes.
+
+    Workspaces of running jobs are never touched, so root may stay above the
+    budget while they are large.
+
+    Returns:
+        Number of workspaces removed
+    """
+    if max_bytes is None:
+        return 0
+    total = _tree_size(root)
+    removed = 0
+    for path, size, _ in failed_workspaces(root):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+class JobWorkspace:
+    """A private scratch directory for one job."""
+
+    def __init__(self, root: str = WORKSPACE_ROOT, prefix: str = "job_",
+                 budget_bytes: Optional[int] = WORKSPACE_BUDGET_BYTES):
+        """Create the workspace directory.
+
+        Args:
+            root: Directory the workspace is created in
+            prefix: Name prefix, to tell workspaces apart when debugging
+            budget_bytes: Disk budget for root, enforced when the workspace is closed
+        """
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.path = tempfile.mkdtemp(prefix=prefix, dir=root)
+        self.closed = False
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def close(self, success: bool = True, reason: Optional[str] = None):
+        """Delete the workspace on success, or keep it (marked as failed) for inspection."""
+        if self.closed:
+            return
+        self.closed = True
+        if success:
+            shutil.rmtree(self.path, ignore_errors=True)
+        else:
+            with open(self.path_for(FAILED_MARKER), "w", encoding="utf-8") as f:
+                f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {reason or ''}\n")
+        enforce_budget(self.root, self.budget_bytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(success=exc_type is None, reason=repr(exc) if exc is not None else None)
+        return False